@@ -4,20 +4,39 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from datetime import datetime
-import hashlib
-import asyncio
+from contextlib import asynccontextmanager
 import json  # ⚠️ EKLENDİ - asyncio.gather için gerekli
+import time
+import asyncio
 
 from services.memory import chat_memory_manager
-from services.knowledge import InformationSnippet, knowledge_system, stats
-from services.web_search import advanced_web_search, scrape_url, SEARXNG_URLS
-from services.db import search_db, save_to_db, collection
-from services.llm import chat_ollama, OLLAMA_MODEL
+from services.summarizer import summarize_turns
+from services.knowledge import knowledge_system, stats
+from services.searxng_router import searxng_router, SEARXNG_URLS
+from services.db import save_to_db, async_collection, rebuild_indexes
+from services.dedup import duplicate_index
+from services.retrieval import retrieval_orchestrator
+from services.scrape_cache import scrape_cache
+from services.scrape_scheduler import scrape_scheduler
+from services.extraction_pool import extraction_pool
+from services.search_cache import search_cache
+from services.answer_cache import answer_cache
+from services.prompt_builder import prompt_builder
+from services.collection_stats import collection_stats
+from services.llm import (
+    chat_ollama_messages, stream_ollama, ollama_readiness, llm_scheduler, prompt_eval_stats, LLMOverloaded,
+    OLLAMA_MODEL, PRIORITY_INTERACTIVE
+)
 from services.rate_limit import check_rate_limit, RATE_LIMIT_PER_MINUTE
+from services.http_clients import http_clients
+from services.embedding import embedding_service
 
 # Chat DB (eğer yoksa hata vermesin)
 try:
-    from services.chat_db import chat_db
+    from services.chat_db import chat_db, InvalidCursor
+    from services.chat_persistence import (
+        chat_writer, load_session, save_summary, clear_session, history_page, export_ndjson
+    )
     CHAT_DB_AVAILABLE = True
 except ImportError:
     CHAT_DB_AVAILABLE = False
@@ -27,7 +46,55 @@ except ImportError:
 # FASTAPI APP
 # ============================================
 
-app = FastAPI(title="DeepSeek AI - SANSÜRSÜZ MOD")
+def print_banner():
+    print("\n" + "=" * 60)
+    print("🔓 DeepSeek AI - SANSÜRSÜZ MOD")
+    print("=" * 60)
+    print(f"📊 Frontend: http://localhost:3000")
+    print(f"🔌 API: http://localhost:8000")
+    print(f"📖 Docs: http://localhost:8000/docs")
+    print(f"🔍 SearXNG: {SEARXNG_URLS[0] if SEARXNG_URLS else 'yok'}")
+    print(f"💾 DB: D:/AI/backend/chroma_db")
+    print(f"🤖 Model: {OLLAMA_MODEL}")
+    print(f"🔓 MOD: SANSÜRSÜZ")
+    print(f"⚡ Rate Limit: {RATE_LIMIT_PER_MINUTE}/dakika")
+    print("=" * 60 + "\n")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Arka plan servislerini ve paylaşılan havuzları aç / kapat
+    await http_clients.startup()
+    ollama_readiness.start()
+    embedding_service.start()
+    await extraction_pool.start()
+    searxng_router.start()
+    await rebuild_indexes()
+    collection_stats.start(async_collection.count, rebuild_indexes)
+    if CHAT_DB_AVAILABLE:
+        await chat_db.start()
+        chat_writer.start()
+        chat_memory_manager.start(summarize_turns, chat_writer.enqueue, load_session, save_summary)
+    else:
+        chat_memory_manager.start(summarize_turns)
+    print_banner()
+    yield
+    await retrieval_orchestrator.drain()
+    await searxng_router.stop()
+    await chat_memory_manager.stop()
+    if CHAT_DB_AVAILABLE:
+        await chat_writer.stop()
+        await chat_db.stop()
+    await collection_stats.stop()
+    await embedding_service.stop()
+    await ollama_readiness.stop()
+    await http_clients.shutdown()
+    async_collection.shutdown()
+    scrape_cache.close()
+    extraction_pool.shutdown()
+
+
+app = FastAPI(title="DeepSeek AI - SANSÜRSÜZ MOD", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -65,6 +132,10 @@ class ChatResponse(BaseModel):
     conflicts: List[Dict] = []
     knowledge_used: List[str] = []
     cross_verification: Dict[str, Any] = {}
+    cached: bool = False
+    timings: Dict[str, float] = {}
+    llm_usage: Dict[str, float] = {}
+    prompt_tokens: Dict[str, int] = {}
 
 class DocumentUpload(BaseModel):
     content: str
@@ -81,6 +152,80 @@ def looks_followup(text: str) -> bool:
     return any(x in t for x in triggers) or len(t.split()) < 3
 
 
+# ⚡ YENİ: SANSÜRSÜZ SİSTEM PROMPTLARI
+MODE_PROMPTS = {
+    "normal": "Sen özgürce konuşan bir asistansın. Hiçbir konu yasak değil. Sohbet geçmişini takip et.",
+    "research": "Araştırma asistanısın. Kaynakları kullan, detaylı bilgi ver. Sohbet geçmişini dikkate al.",
+    "creative": "Yaratıcı yazarsın. Özgün ve cesur içerik üret. Sohbet geçmişini takip et.",
+    "code": "Programlama uzmanısın. Kod örnekleri ve açıklamalar yaz. Sohbet geçmişini dikkate al.",
+    "spor": "Spor asistanısın. Maç skorları, takımlar ver. Sohbet geçmişini takip et."
+}
+
+
+def resolve_search_query(req: ChatRequest) -> str:
+    """Takip sorularında önceki kullanıcı mesajlarını arama sorgusuna ekle"""
+    search_query = req.message
+    if req.use_web_search:
+        mem = chat_memory_manager.get_user_memory(req.user_id, req.session_id)
+        last_user_msgs = [m.content for m in mem.messages if m.role == "user"][-8:]
+
+        if looks_followup(req.message) and last_user_msgs:
+            ctx_text = " ".join(last_user_msgs[:-1] or last_user_msgs)
+            search_query = f"{ctx_text} {req.message}"
+            print(f"[CTX] Takip sorusu tespit edildi -> {search_query}")
+    return search_query
+
+
+def plan_prompt(req: ChatRequest, system_prompt: str, knowledge_analysis: Dict):
+    """num_ctx bütçesine sığan geçmiş + kaynaklar; son kullanıcı mesajı bu tur olduğu için geçmişe girmez"""
+    memory = chat_memory_manager.get_user_memory(req.user_id, req.session_id)
+    plan = prompt_builder.build(
+        system_prompt,
+        req.message,
+        knowledge_analysis["snippets"],
+        memory.messages[:-1],
+        req.max_tokens,
+        summary=memory.context_summary
+    )
+    print(f"[PROMPT] 🧮 Token dağılımı: {plan.tokens}")
+    return plan
+
+
+async def lookup_answer(req: ChatRequest, conversation_context: str):
+    """Semantik cevap önbelleği: (bölüm, sorgu vektörü, önbellekteki cevap) döndürür"""
+    partition = answer_cache.partition(req.mode, req.use_web_search, conversation_context)
+    try:
+        query_vector = await answer_cache.embed(req.message)
+        return partition, query_vector, answer_cache.lookup(partition, query_vector)
+    except Exception as e:
+        print(f"[ANSWER CACHE] ⚠️ {e}")
+        return partition, None, None
+
+
+def build_chat_response(req: ChatRequest, response_text: str, retrieval, knowledge_analysis: Dict) -> ChatResponse:
+    return ChatResponse(
+        response=response_text,
+        sources=retrieval.sources,
+        used_db=retrieval.used_db,
+        used_web=retrieval.used_web,
+        db_count=len(retrieval.db_snippets),
+        web_count=len(retrieval.sources),
+        mode=req.mode,
+        confidence_score=knowledge_analysis["highest_confidence"],
+        has_conflicts=knowledge_analysis["has_conflicts"],
+        conflicts=knowledge_analysis["conflicts"],
+        knowledge_used=[s.source_type for s in knowledge_analysis["snippets"][:3]],
+        cross_verification=knowledge_analysis["cross_verification"],
+        timings=retrieval.timings
+    )
+
+
+def record_confidence(knowledge_analysis: Dict):
+    stats["confidence_scores"].append(knowledge_analysis["highest_confidence"])
+    if len(stats["confidence_scores"]) > 100:
+        stats["confidence_scores"] = stats["confidence_scores"][-100:]
+
+
 # ============================================
 # DEBUG: HAFIZA GÖRME
 # ============================================
@@ -112,15 +257,16 @@ async def debug_memory(user_id: str, session_id: str):
 
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(req: ChatRequest, x_forwarded_for: Optional[str] = Header(None)):
-    # 1) Sohbet hafızası
-    conversation_context = chat_memory_manager.get_conversation_context(req.user_id, req.session_id)
-    chat_memory_manager.add_message(req.user_id, req.session_id, "user", req.message)
-
-    # 2) Rate limit
+    # 1) Rate limit
     client_ip = x_forwarded_for or "127.0.0.1"
     if not check_rate_limit(client_ip):
         raise HTTPException(429, "Çok fazla istek. Dakikada max 30 sorgu.")
 
+    # 2) Sohbet hafızası (bellekte yoksa SQLite'tan yüklenir)
+    await chat_memory_manager.hydrate(req.user_id, req.session_id)
+    conversation_context = chat_memory_manager.get_conversation_context(req.user_id, req.session_id)
+    chat_memory_manager.add_message(req.user_id, req.session_id, "user", req.message)
+
     stats["total_queries"] += 1
 
     print(f"\n{'=' * 60}")
@@ -128,185 +274,72 @@ async def chat(req: ChatRequest, x_forwarded_for: Optional[str] = Header(None)):
     print(f"💬 Sohbet Geçmişi: {len(conversation_context.splitlines())} satır")
     print(f"{'=' * 60}")
 
-    sources: List[Dict] = []
-    web_snippets: List[InformationSnippet] = []
-    db_snippets: List[InformationSnippet] = []
-    used_db = False
-    used_web = False
-
-    # 3) DB araması
-    print("[1/5] ChromaDB aranıyor...")
-    db_results = search_db(req.message, n=3, min_relevance=60.0)
-
-    if db_results:
-        used_db = True
-        for item in db_results:
-            scraped_at = item["metadata"].get("scraped_at", datetime.now().isoformat())
-            db_snippets.append(
-                InformationSnippet(
-                    content=item["content"],
-                    source_type="internal_kb",
-                    source_url=item["metadata"].get("url", ""),
-                    confidence=item["relevance"] / 100,
-                    timestamp=datetime.fromisoformat(scraped_at),
-                    category=item["metadata"].get("category", "general")
-                )
-            )
-
-    # 4) Web araması
-    if req.use_web_search:
-        print("[2/5] Gelişmiş web araması yapılıyor...")
-        stats["total_web_searches"] += 1
+    # Semantik cevap önbelleği (neredeyse aynı soru + aynı sohbet geçmişi)
+    cache_started = time.perf_counter()
+    cache_partition, query_vector, cached = await lookup_answer(req, conversation_context)
+    if cached is not None:
+        chat_memory_manager.add_message(req.user_id, req.session_id, "assistant", cached["response"])
+        return ChatResponse(
+            **cached,
+            cached=True,
+            timings={"answer_cache": round((time.perf_counter() - cache_started) * 1000, 1)}
+        )
 
-        mem = chat_memory_manager.get_user_memory(req.user_id, req.session_id)
-        last_user_msgs = [m.content for m in mem.messages if m.role == "user"][-8:]
+    # 3-4) DB + web araması (paralel)
+    search_query = resolve_search_query(req)
 
-        augmented_query = req.message
-        if looks_followup(req.message) and last_user_msgs:
-            ctx_text = " ".join(last_user_msgs[:-1] or last_user_msgs)
-            augmented_query = f"{ctx_text} {req.message}"
-            print(f"[CTX] Takip sorusu tespit edildi -> {augmented_query}")
-
-        search_results = await advanced_web_search(augmented_query, req.max_sources)
-
-        if search_results:
-            used_web = True
-            print(f"[3/5] {len(search_results)} URL scraping...")
-
-            scrape_tasks = [scrape_url(r["url"]) for r in search_results]
-            scraped_contents = await asyncio.gather(*scrape_tasks, return_exceptions=True)
-
-            for result, content in zip(search_results, scraped_contents):
-                if isinstance(content, str) and len(content) > 100:
-                    qa = knowledge_system.assess_content_quality_advanced(
-                        content, result["title"], result["url"]
-                    )
-                    if qa["quality_score"] < 0.4:
-                        stats["quality_rejected"] += 1
-                        continue
-
-                    domain_trust = qa["domain_trust"]
-                    source_type = "general_web"
-                    if domain_trust > 0.9:
-                        source_type = "official_site"
-                    elif domain_trust > 0.8:
-                        source_type = "reputable_news"
-
-                    doc_id = f"web_{hashlib.md5(result['url'].encode()).hexdigest()[:8]}"
-                    if save_to_db(content, {
-                        "source": "web",
-                        "url": result["url"],
-                        "title": result["title"],
-                        "query": req.message,
-                        "category": "web_scraped",
-                        "scraped_at": datetime.now().isoformat(),
-                        "quality_score": qa["quality_score"],
-                        "domain_trust": domain_trust
-                    }, doc_id):
-                        stats["total_scraped"] += 1
-
-                    web_snippets.append(
-                        InformationSnippet(
-                            content=f"{result['title']}: {content}",
-                            source_type=source_type,
-                            source_url=result["url"],
-                            confidence=domain_trust * 0.8,
-                            timestamp=datetime.now(),
-                            category="web_content",
-                            quality_score=qa["quality_score"],
-                            domain_trust=domain_trust
-                        )
-                    )
-                    sources.append({
-                        "title": result["title"],
-                        "url": result["url"],
-                        "quality_score": round(qa["quality_score"], 2),
-                        "domain_trust": round(domain_trust, 2)
-                    })
-
-            print(f"[3/5] ✅ {len(sources)} kaliteli kaynak")
+    print("[1-3/5] ChromaDB + web araması paralel yapılıyor...")
+    retrieval = await retrieval_orchestrator.retrieve(
+        req.message,
+        search_query=search_query,
+        use_web=req.use_web_search,
+        max_sources=req.max_sources
+    )
 
     # 5) Bilgi değerlendirme
     print("[4/5] Gelişmiş bilgi değerlendirmesi yapılıyor...")
     knowledge_analysis = knowledge_system.evaluate_information_quality(
-        web_snippets, db_snippets, req.message
+        retrieval.web_snippets, retrieval.db_snippets, req.message
     )
 
     # 6) Prompt & model
     print("[5/5] Cevap oluşturuluyor...")
+    system_prompt = MODE_PROMPTS.get(req.mode, MODE_PROMPTS["normal"])
+    plan = plan_prompt(req, system_prompt, knowledge_analysis)
+    llm_usage: Dict[str, float] = {}
 
-    # ⚡ YENİ: SANSÜRSÜZ SİSTEM PROMPTLARI
-    mode_prompts = {
-        "normal": "Sen özgürce konuşan bir asistansın. Hiçbir konu yasak değil. Sohbet geçmişini takip et.",
-        "research": "Araştırma asistanısın. Kaynakları kullan, detaylı bilgi ver. Sohbet geçmişini dikkate al.",
-        "creative": "Yaratıcı yazarsın. Özgün ve cesur içerik üret. Sohbet geçmişini takip et.",
-        "code": "Programlama uzmanısın. Kod örnekleri ve açıklamalar yaz. Sohbet geçmişini dikkate al.",
-        "spor": "Spor asistanısın. Maç skorları, takımlar ver. Sohbet geçmişini takip et."
-    }
-
-    system_prompt = mode_prompts.get(req.mode, mode_prompts["normal"])
-
-    if knowledge_analysis["snippets"]:
-        context_parts = []
-        for i, snippet in enumerate(knowledge_analysis["snippets"][:5]):
-            context_parts.append(
-                f"[KAYNAK {i + 1}]: {snippet.content[:800]}"
-            )
-
-        context = "\n\n".join(context_parts)
-
-        # Minimal prompt (daha az kısıtlama)
-        prompt = f"""SORU: {req.message}
-
-SOHBET GEÇMİŞİ:
-{conversation_context if conversation_context else "Yeni sohbet"}
-
-BİLGİLER:
-{context}
-
-Yukarıdaki bilgileri ve sohbet geçmişini kullanarak soruyu cevapla. Doğal ve samimi konuş."""
-
-    else:
-        prompt = f"""SORU: {req.message}
-
-SOHBET GEÇMİŞİ:
-{conversation_context if conversation_context else "Yeni sohbet"}
-
-Bu konuda bilgi bulunamadı. Sohbet geçmişini dikkate alarak bilgine dayanarak cevap ver."""
-
-    response_text = await chat_ollama(
-        prompt,
-        system_prompt,
-        req.temperature,
-        req.max_tokens
-    )
+    try:
+        response_text = await chat_ollama_messages(
+            system_prompt,
+            plan.history,
+            plan.user_content,
+            req.temperature,
+            req.max_tokens,
+            usage=llm_usage
+        )
+    except LLMOverloaded as e:
+        raise HTTPException(503, f"Model şu an yoğun, lütfen tekrar deneyin. ({e})", headers={"Retry-After": "5"})
 
     chat_memory_manager.add_message(req.user_id, req.session_id, "assistant", response_text)
 
-    stats["confidence_scores"].append(knowledge_analysis["highest_confidence"])
-    if len(stats["confidence_scores"]) > 100:
-        stats["confidence_scores"] = stats["confidence_scores"][-100:]
+    record_confidence(knowledge_analysis)
 
     print(
-        f"[DONE] DB:{used_db} Web:{used_web} "
+        f"[DONE] DB:{retrieval.used_db} Web:{retrieval.used_web} "
         f"Güven:{knowledge_analysis['highest_confidence']}"
     )
     print("=" * 60 + "\n")
 
-    return ChatResponse(
-        response=response_text,
-        sources=sources,
-        used_db=used_db,
-        used_web=used_web,
-        db_count=len(db_snippets),
-        web_count=len(sources),
-        mode=req.mode,
-        confidence_score=knowledge_analysis["highest_confidence"],
-        has_conflicts=knowledge_analysis["has_conflicts"],
-        conflicts=knowledge_analysis["conflicts"],
-        knowledge_used=[s.source_type for s in knowledge_analysis["snippets"][:3]],
-        cross_verification=knowledge_analysis["cross_verification"]
-    )
+    response = build_chat_response(req, response_text, retrieval, knowledge_analysis)
+    response.llm_usage = llm_usage
+    response.prompt_tokens = plan.tokens
+
+    if query_vector is not None:
+        answer_cache.store(
+            cache_partition, query_vector, req.message,
+            response.model_dump(exclude={"cached", "timings", "llm_usage", "prompt_tokens"})
+        )
+    return response
 
 # ============================================
 # DİĞER ENDPOINT'LER
@@ -320,7 +353,7 @@ async def upload_doc(doc: DocumentUpload):
 
         doc_id = f"doc_{datetime.now().timestamp()}"
 
-        if save_to_db(doc.content, {
+        if await save_to_db(doc.content, {
             "source": "user_upload",
             "filename": doc.filename,
             "uploaded_at": datetime.now().isoformat(),
@@ -337,7 +370,7 @@ async def upload_doc(doc: DocumentUpload):
 @app.get("/api/stats")
 async def get_stats():
     """İstatistikleri döndür - Frontend ile uyumlu"""
-    stats["db_size"] = collection.count()
+    stats["db_size"] = collection_stats.chunks
     avg_confidence = (
         sum(stats["confidence_scores"]) / len(stats["confidence_scores"])
         if stats["confidence_scores"] else 0
@@ -346,20 +379,40 @@ async def get_stats():
     # Frontend'in beklediği ek alanlar
     return {
         **stats,
-        "cache_size": "unknown",
+        "cache_size": len(search_cache.entries),
         "avg_confidence": round(avg_confidence, 2),
         "timestamp": datetime.now().isoformat(),
         # ⚠️ Frontend'de kullanılan ama eksik olan alanlar:
         "total_scraped_sites": stats.get("total_scraped", 0),  # total_scraped → total_scraped_sites
+        "http_pools": http_clients.get_stats(),
+        "embedding": embedding_service.get_stats(),
+        "embedding_cache": embedding_service.cache.get_stats(),
+        "chroma": async_collection.get_stats(),
+        "dedup": duplicate_index.get_stats(),
+        "collection": collection_stats.get_stats(),
+        "retrieval": retrieval_orchestrator.get_stats(),
+        "scrape_cache": scrape_cache.get_stats(),
+        "scrape_scheduler": scrape_scheduler.get_stats(),
+        "extraction_pool": extraction_pool.get_stats(),
+        "search_cache": search_cache.get_stats(),
+        "searxng": searxng_router.get_stats(),
+        "answer_cache": answer_cache.get_stats(),
+        "llm_scheduler": llm_scheduler.get_stats(),
+        "prompt_eval": prompt_eval_stats.get_stats(),
+        "prompt_builder": prompt_builder.get_stats(),
+        "memory": chat_memory_manager.get_stats(),
+        "chat_writer": chat_writer.get_stats() if CHAT_DB_AVAILABLE else None,
+        "chat_db": chat_db.get_stats() if CHAT_DB_AVAILABLE else None,
     }
 
 
 @app.get("/api/health")
 async def health():
     health_info = {
-        "ollama": "BİLİNMİYOR",
-        "searxng": "BİLİNMİYOR",
-        "db_size": collection.count(),
+        "ollama": ollama_readiness.describe(),
+        "ollama_status": ollama_readiness.get_stats(),
+        "searxng": f"{sum(i.healthy for i in searxng_router.instances)}/{len(searxng_router.instances)} aktif",
+        "db_size": collection_stats.chunks,
         "model": OLLAMA_MODEL,
         "knowledge_system": "✅ Active",
         "searxng_url": SEARXNG_URLS[0] if SEARXNG_URLS else None,
@@ -370,12 +423,14 @@ async def health():
 
 @app.get("/api/chat/memory/{user_id}/{session_id}")
 async def get_chat_memory(user_id: str, session_id: str):
+    await chat_memory_manager.hydrate(user_id, session_id)
     memory = chat_memory_manager.get_user_memory(user_id, session_id)
     return {
         "user_id": user_id,
         "session_id": session_id,
         "total_messages": len(memory.messages),
         "last_activity": memory.last_activity,
+        "context_summary": memory.context_summary,
         "messages": [
             {
                 "role": msg.role,
@@ -389,27 +444,33 @@ async def get_chat_memory(user_id: str, session_id: str):
 
 @app.delete("/api/chat/memory/{user_id}/{session_id}")
 async def clear_chat_memory(user_id: str, session_id: str):
+    if CHAT_DB_AVAILABLE:
+        await clear_session(user_id, session_id)
     chat_memory_manager.clear_memory(user_id, session_id)
     return {"success": True, "message": "Sohbet hafızası temizlendi"}
 
 
 # ⚠️ YENİ ENDPOINT: History (Frontend bunu çağırıyor)
 @app.get("/api/history/{user_id}/{session_id}")
-async def get_chat_history(user_id: str, session_id: str, limit: int = 100):
-    """Sohbet geçmişini döndür"""
+async def get_chat_history(user_id: str, session_id: str, limit: int = 100, before: Optional[str] = None):
+    """
+    Sohbet geçmişini döndür (eski → yeni).
+    DB varsa (timestamp, id) imleciyle sayfalanır: daha eski mesajlar için
+    cevaptaki next_cursor değerini before parametresiyle gönder.
+    """
     try:
+        await chat_memory_manager.hydrate(user_id, session_id)
         memory = chat_memory_manager.get_user_memory(user_id, session_id)
-        
-        # Son N mesajı al
-        recent_messages = memory.messages[-limit:] if len(memory.messages) > limit else memory.messages
-        
-        return {
-            "success": True,
-            "user_id": user_id,
-            "session_id": session_id,
-            "total": len(memory.messages),
-            "returned": len(recent_messages),
-            "messages": [
+
+        if CHAT_DB_AVAILABLE:
+            try:
+                messages, next_cursor = await history_page(user_id, session_id, limit, before)
+            except InvalidCursor as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        else:
+            # Kalıcı kayıt yoksa sadece bellekteki son N mesaj
+            recent_messages = memory.messages[-limit:] if len(memory.messages) > limit else memory.messages
+            messages = [
                 {
                     "role": msg.role,
                     "content": msg.content,
@@ -417,7 +478,21 @@ async def get_chat_history(user_id: str, session_id: str, limit: int = 100):
                 }
                 for msg in recent_messages
             ]
+            next_cursor = None
+
+        return {
+            "success": True,
+            "user_id": user_id,
+            "session_id": session_id,
+            # Bellekte tutulan (katlama/kırpma sonrası) mesaj sayısı; DB'deki toplam değil
+            "in_memory": len(memory.messages),
+            "returned": len(messages),
+            "has_more": next_cursor is not None,
+            "next_cursor": next_cursor,
+            "messages": messages
         }
+    except HTTPException:
+        raise
     except Exception as e:
         return {
             "success": False,
@@ -426,125 +501,165 @@ async def get_chat_history(user_id: str, session_id: str, limit: int = 100):
         }
 
 
+@app.get("/api/history/{user_id}/{session_id}/export")
+async def export_chat_history(user_id: str, session_id: str, gzip: bool = False):
+    """Oturumun tüm geçmişini NDJSON olarak akıt (gzip=true ile sıkıştırılmış dosya)"""
+    if not CHAT_DB_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Kalıcı sohbet kaydı devre dışı")
+
+    filename = f"chat_{user_id}_{session_id}.ndjson" + (".gz" if gzip else "")
+    return StreamingResponse(
+        export_ndjson(user_id, session_id, compress=gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 # ⚠️ YENİ ENDPOINT: Streaming Chat
+def sse(payload: Dict) -> str:
+    return f"data: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n"
+
+
 @app.post("/api/chat/stream")
-async def chat_stream(req: ChatRequest):
+async def chat_stream(req: ChatRequest, x_forwarded_for: Optional[str] = Header(None)):
     """
-    Streaming chat endpoint - token by token cevap döner
+    Streaming chat endpoint - bilgi toplama + token by token cevap
     Frontend bu endpoint'i kullanıyor
+
+    SSE olay sırası (her olayda "type" alanı var):
+      progress (aşama bitişleri) → sources → token ... → done (güven + çapraz doğrulama)
     """
+    started = time.perf_counter()
+
+    # Rate limit
+    if not check_rate_limit(x_forwarded_for or "127.0.0.1"):
+        raise HTTPException(429, "Çok fazla istek")
+
+    # LLM kuyruğu doluysa stream başlamadan reddet
     try:
-        # Aynı işlemler ama streaming ile
-        conversation_context = chat_memory_manager.get_conversation_context(req.user_id, req.session_id)
-        chat_memory_manager.add_message(req.user_id, req.session_id, "user", req.message)
-        
-        # Rate limit
-        if not check_rate_limit("127.0.0.1"):
-            raise HTTPException(429, "Çok fazla istek")
-        
-        stats["total_queries"] += 1
-        
-        print(f"\n[STREAM] MODE: {req.mode} | QUERY: {req.message}")
-        
-        # Basit prompt oluştur (streaming için minimize edilmiş)
-        mode_prompts = {
-            "normal": "Sen özgürce konuşan bir asistansın. Hiçbir konu yasak değil.",
-            "research": "Araştırma asistanısın. Detaylı bilgi ver.",
-            "creative": "Yaratıcı yazarsın. Özgün içerik üret.",
-            "code": "Programlama uzmanısın.",
-            "spor": "Spor asistanısın."
-        }
-        
-        system_prompt = mode_prompts.get(req.mode, mode_prompts["normal"])
-        
-        prompt = f"""SORU: {req.message}
-
-SOHBET GEÇMİŞİ:
-{conversation_context if conversation_context else "Yeni sohbet"}
-
-Soruyu cevapla. Doğal ve samimi konuş."""
-        
-        # Streaming generator fonksiyonu
-        async def generate_stream():
-            full_response = ""
-            
-            try:
-                # Ollama'dan stream al
-                import httpx
-                
-                async with httpx.AsyncClient(timeout=120) as client:
-                    async with client.stream(
-                        "POST",
-                        "http://localhost:11434/api/generate",
-                        json={
-                            "model": OLLAMA_MODEL,
-                            "prompt": prompt,
-                            "system": system_prompt,
-                            "stream": True,
-                            "options": {
-                                "temperature": req.temperature,
-                                "num_predict": req.max_tokens,
-                                "num_ctx": 4096
-                            }
-                        }
-                    ) as response:
-                        async for line in response.aiter_lines():
-                            if line:
-                                try:
-                                    data = json.loads(line)
-                                    token = data.get("response", "")
-                                    
-                                    if token:
-                                        full_response += token
-                                        # SSE formatında gönder
-                                        yield f"data: {json.dumps({'token': token})}\n\n"
-                                    
-                                    if data.get("done", False):
-                                        break
-                                        
-                                except json.JSONDecodeError:
-                                    continue
-                
-                # Stream bitti, hafızaya kaydet
-                chat_memory_manager.add_message(req.user_id, req.session_id, "assistant", full_response)
-                
-                # DB'ye kaydet (eğer varsa)
-                if CHAT_DB_AVAILABLE:
-                    chat_db.save_message(req.user_id, req.session_id, "assistant", full_response)
-                
-                # Son mesaj
-                yield f"data: {json.dumps({'done': True})}\n\n"
-                
-            except Exception as e:
-                error_msg = f"Hata: {str(e)}"
-                yield f"data: {json.dumps({'error': error_msg})}\n\n"
-        
-        return StreamingResponse(
-            generate_stream(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "X-Accel-Buffering": "no"
-            }
+        llm_scheduler.ensure_capacity(PRIORITY_INTERACTIVE)
+    except LLMOverloaded as e:
+        raise HTTPException(503, f"Model şu an yoğun, lütfen tekrar deneyin. ({e})", headers={"Retry-After": "5"})
+
+    await chat_memory_manager.hydrate(req.user_id, req.session_id)
+    conversation_context = chat_memory_manager.get_conversation_context(req.user_id, req.session_id)
+    chat_memory_manager.add_message(req.user_id, req.session_id, "user", req.message)
+
+    stats["total_queries"] += 1
+
+    print(f"\n[STREAM] MODE: {req.mode} | QUERY: {req.message}")
+
+    def save_reply(text: str):
+        # DB'ye yazma hafıza üzerinden write-behind kuyruğuyla yapılır
+        chat_memory_manager.add_message(req.user_id, req.session_id, "assistant", text)
+
+    async def generate_stream():
+        # Semantik cevap önbelleği
+        cache_partition, query_vector, cached = await lookup_answer(req, conversation_context)
+        if cached is not None:
+            save_reply(cached["response"])
+            yield sse({"type": "sources", "sources": cached["sources"], "used_db": cached["used_db"], "used_web": cached["used_web"]})
+            yield sse({"type": "token", "token": cached["response"]})
+            yield sse({"type": "done", "done": True, **{k: v for k, v in cached.items() if k != "response"}, "cached": True})
+            return
+
+        # 1) Bilgi toplama: aşama bitişleri progress olayı olarak akar
+        events: asyncio.Queue = asyncio.Queue()
+        yield sse({"type": "progress", "stage": "retrieval_start"})
+        retrieval_task = asyncio.create_task(retrieval_orchestrator.retrieve(
+            req.message,
+            search_query=resolve_search_query(req),
+            use_web=req.use_web_search,
+            max_sources=req.max_sources,
+            progress=lambda stage, info: events.put_nowait({"type": "progress", "stage": stage, **info})
+        ))
+        try:
+            while True:
+                getter = asyncio.ensure_future(events.get())
+                await asyncio.wait({getter, retrieval_task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield sse(getter.result())
+                    continue
+                getter.cancel()
+                break
+            while not events.empty():
+                yield sse(events.get_nowait())
+            retrieval = retrieval_task.result()
+        except Exception as e:
+            yield sse({"type": "error", "error": f"Bilgi toplama hatası: {e}"})
+            return
+        finally:
+            # İstemci bağlantıyı kapatırsa arka plandaki toplamayı da durdur
+            if not retrieval_task.done():
+                retrieval_task.cancel()
+
+        # 2) Kaynaklar seçildi: cevap üretiminden önce gönder
+        knowledge_analysis = knowledge_system.evaluate_information_quality(
+            retrieval.web_snippets, retrieval.db_snippets, req.message
         )
-    
-    except Exception as e:
-        raise HTTPException(500, str(e))
+        yield sse({
+            "type": "sources",
+            "sources": retrieval.sources,
+            "used_db": retrieval.used_db,
+            "used_web": retrieval.used_web
+        })
+
+        # 3) Tokenlar
+        yield sse({"type": "progress", "stage": "generating"})
+        system_prompt = MODE_PROMPTS.get(req.mode, MODE_PROMPTS["normal"])
+        plan = plan_prompt(req, system_prompt, knowledge_analysis)
+        timings = retrieval.timings
+        llm_usage: Dict[str, float] = {}
+        full_response = ""
+        try:
+            async for token in stream_ollama(
+                system_prompt,
+                plan.history,
+                plan.user_content,
+                req.temperature,
+                req.max_tokens,
+                usage=llm_usage
+            ):
+                if not full_response:
+                    retrieval_orchestrator.record(timings, "time_to_first_token", started)
+                full_response += token
+                yield sse({"type": "token", "token": token})
+        except LLMOverloaded as e:
+            yield sse({"type": "error", "error": f"Model şu an yoğun, lütfen tekrar deneyin. ({e})", "retry_after": 5})
+            return
+        except Exception as e:
+            yield sse({"type": "error", "error": f"Hata: {str(e)}"})
+            return
+        retrieval_orchestrator.record(timings, "stream_total", started)
+
+        # Stream bitti, hafızaya kaydet
+        save_reply(full_response)
+        record_confidence(knowledge_analysis)
+
+        response = build_chat_response(req, full_response, retrieval, knowledge_analysis)
+        response.llm_usage = llm_usage
+        response.prompt_tokens = plan.tokens
+        if query_vector is not None and full_response:
+            answer_cache.store(
+                cache_partition, query_vector, req.message,
+                response.model_dump(exclude={"cached", "timings", "llm_usage", "prompt_tokens"})
+            )
+
+        # 4) Son olay: güven + çapraz doğrulama
+        yield sse({"type": "done", "done": True, **response.model_dump(exclude={"response", "sources"})})
+
+    return StreamingResponse(
+        generate_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
 
 
 if __name__ == "__main__":
-    import uvicorn
-    print("\n" + "=" * 60)
-    print("🔓 DeepSeek AI - SANSÜRSÜZ MOD")
-    print("=" * 60)
-    print(f"📊 Frontend: http://localhost:3000")
-    print(f"🔌 API: http://localhost:8000")
-    print(f"📖 Docs: http://localhost:8000/docs")
-    print(f"🔍 SearXNG: {SEARXNG_URLS[0] if SEARXNG_URLS else 'yok'}")
-    print(f"💾 DB: D:/AI/backend/chroma_db")
-    print(f"🤖 Model: {OLLAMA_MODEL}")
-    print(f"🔓 MOD: SANSÜRSÜZ")
-    print(f"⚡ Rate Limit: {RATE_LIMIT_PER_MINUTE}/dakika")
-    print("=" * 60 + "\n")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Windows'ta (spawn) extraction worker'ları __main__'i yeniden içe aktarır;
+    # "python main.py" her worker'da embedding modelini ve Chroma'yı tekrar yüklerdi
+    raise SystemExit("Backend'i şununla başlatın: python -m uvicorn main:app --host 0.0.0.0 --port 8000")
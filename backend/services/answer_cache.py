@@ -0,0 +1,142 @@
+from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+import time
+import hashlib
+
+import numpy as np
+
+from services.embedding import embedding_service
+from services.search_cache import normalize_query
+
+ANSWER_CACHE_THRESHOLD = 0.95           # kosinüs benzerliği alt sınırı
+ANSWER_CACHE_MAX_ENTRIES = 500
+ANSWER_CACHE_MODE_TTL = {               # saniye - 0 ise o mod önbelleğe alınmaz
+    "normal": 30 * 60,
+    "research": 60 * 60,
+    "code": 60 * 60,
+    "spor": 5 * 60,                     # skorlar hızlı değişir
+    "creative": 0                       # her seferinde farklı içerik beklenir
+}
+ANSWER_CACHE_DEFAULT_TTL = 15 * 60
+
+# chat_ollama_messages hata durumunda bu öneklerle metin döndürür; bunlar saklanmaz
+_ERROR_PREFIXES = ("❌", "⏱️", "Ollama HTTP", "Cevap üretilemedi")
+
+
+def context_hash(conversation_context: str) -> str:
+    """Sohbet geçmişinin özeti; takip soruları ayrı anahtara düşsün"""
+    return hashlib.sha1(conversation_context.encode("utf-8")).hexdigest()[:16]
+
+
+class AnswerEntry:
+    __slots__ = ("partition", "vector", "query", "payload", "expires_at")
+
+    def __init__(self, partition: Tuple, vector: np.ndarray, query: str, payload: Dict, expires_at: float):
+        self.partition = partition
+        self.vector = vector
+        self.query = query
+        self.payload = payload
+        self.expires_at = expires_at
+
+
+class AnswerCache:
+    """
+    Neredeyse aynı sorular için semantik cevap önbelleği.
+    - Anahtar: sorgu embedding'i + (mod, web araması, sohbet geçmişi hash'i)
+    - Aynı bölümdeki kayıtlar arasında kosinüs benzerliği eşiği aşan en yakın kayıt döner
+    - Mod başına TTL, kayıt sayısıyla sınırlı LRU
+    """
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[int, AnswerEntry]" = OrderedDict()
+        self.partitions: Dict[Tuple, Dict[int, AnswerEntry]] = {}
+        self._next_id = 0
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0, "skipped": 0}
+        self.similarity_total = 0.0
+
+    def ttl_for(self, mode: str) -> float:
+        return ANSWER_CACHE_MODE_TTL.get(mode, ANSWER_CACHE_DEFAULT_TTL)
+
+    def partition(self, mode: str, use_web: bool, conversation_context: str) -> Tuple:
+        return (mode, use_web, context_hash(conversation_context))
+
+    async def embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(await embedding_service.encode(normalize_query(query)), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, entry_id: int):
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return
+        bucket = self.partitions.get(entry.partition)
+        if bucket is not None:
+            bucket.pop(entry_id, None)
+            if not bucket:
+                del self.partitions[entry.partition]
+
+    def lookup(self, partition: Tuple, vector: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Bölümdeki en benzer geçerli kaydın cevabını döndür"""
+        bucket = self.partitions.get(partition)
+        if not bucket:
+            self.counters["misses"] += 1
+            return None
+
+        now = time.monotonic()
+        for entry_id in [i for i, e in bucket.items() if e.expires_at <= now]:
+            self._remove(entry_id)
+            self.counters["expired"] += 1
+
+        bucket = self.partitions.get(partition)
+        if not bucket:
+            self.counters["misses"] += 1
+            return None
+
+        ids = list(bucket)
+        matrix = np.stack([bucket[i].vector for i in ids])
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            self.counters["misses"] += 1
+            return None
+
+        entry_id = ids[best]
+        self.entries.move_to_end(entry_id)
+        self.counters["hits"] += 1
+        self.similarity_total += float(scores[best])
+        print(f"[ANSWER CACHE] ✅ Eşleşme ({scores[best]:.3f}): {bucket[entry_id].query[:50]}")
+        return bucket[entry_id].payload
+
+    def store(self, partition: Tuple, vector: np.ndarray, query: str, payload: Dict[str, Any]):
+        ttl = self.ttl_for(partition[0])
+        if ttl <= 0 or str(payload.get("response", "")).startswith(_ERROR_PREFIXES):
+            self.counters["skipped"] += 1
+            return
+
+        entry_id = self._next_id
+        self._next_id += 1
+        entry = AnswerEntry(partition, vector, query, payload, time.monotonic() + ttl)
+        self.entries[entry_id] = entry
+        self.partitions.setdefault(partition, {})[entry_id] = entry
+        self.counters["stores"] += 1
+
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+            self.counters["evictions"] += 1
+
+    def get_stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else 0.0,
+            "avg_hit_similarity": round(self.similarity_total / self.counters["hits"], 3) if self.counters["hits"] else None,
+            "entries": len(self.entries),
+            "partitions": len(self.partitions),
+            "threshold": self.threshold
+        }
+
+
+# Global cevap önbelleği
+answer_cache = AnswerCache()
@@ -1,101 +1,332 @@
-from sqlalchemy import create_engine, Column, String, Text, DateTime, Integer
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+import base64
 import json
+import asyncio
 
-Base = declarative_base()
+import aiosqlite
 
-class ChatHistory(Base):
-    __tablename__ = "chat_history"
-    
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(String(100), nullable=False, index=True)
-    session_id = Column(String(100), nullable=False, index=True)
-    role = Column(String(20), nullable=False)  # user veya assistant
-    content = Column(Text, nullable=False)
-    timestamp = Column(DateTime, default=datetime.now)
-    extra_data = Column(Text, default="{}")  # metadata için
+# SQLAlchemy DateTime ile aynı metin biçimi (eski kayıtlarla sıralama/karşılaştırma uyumlu)
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+READ_CONNECTIONS = 2            # WAL'da okuyucular yazarı beklemez
+EXPORT_FETCH_ROWS = 500         # export imlecinden tek seferde çekilen satır
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",        # WAL'da güvenli; commit başına fsync yok
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",         # ~16MB sayfa önbelleği
+    "PRAGMA mmap_size=134217728",       # 128MB
+    "PRAGMA busy_timeout=5000"
+)
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS chat_history (
+        id INTEGER NOT NULL PRIMARY KEY,
+        user_id VARCHAR(100) NOT NULL,
+        session_id VARCHAR(100) NOT NULL,
+        role VARCHAR(20) NOT NULL,
+        content TEXT NOT NULL,
+        timestamp DATETIME,
+        extra_data TEXT
+    )""",
+    # Oturum sorguları (filtre + zaman sırası) tek indeksten karşılanır
+    "CREATE INDEX IF NOT EXISTS ix_chat_history_user_session_ts ON chat_history (user_id, session_id, timestamp)",
+    # Bileşik indeksin kapsadığı eski tek kolonlu indeksler sadece yazmayı yavaşlatıyor
+    "DROP INDEX IF EXISTS ix_chat_history_user_id",
+    "DROP INDEX IF EXISTS ix_chat_history_session_id",
+    # Oturumun katlanmış özeti (covered_until: özete giren son mesajın zamanı)
+    """CREATE TABLE IF NOT EXISTS chat_summary (
+        user_id VARCHAR(100) NOT NULL,
+        session_id VARCHAR(100) NOT NULL,
+        summary TEXT NOT NULL,
+        covered_until DATETIME NOT NULL,
+        updated_at DATETIME NOT NULL,
+        PRIMARY KEY (user_id, session_id)
+    )"""
+)
+
+INSERT_SQL = (
+    "INSERT INTO chat_history (user_id, session_id, role, content, timestamp, extra_data) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+RECENT_SQL = (
+    "SELECT role, content, timestamp FROM chat_history "
+    "WHERE user_id = ? AND session_id = ? AND timestamp >= ? "
+    "ORDER BY timestamp DESC, id DESC LIMIT ?"
+)
+
+# Keyset sayfalama: (timestamp, id) imlecinden eskiye doğru, indeks sırasıyla
+PAGE_SQL = (
+    "SELECT id, role, content, timestamp, extra_data FROM chat_history "
+    "WHERE user_id = ? AND session_id = ? "
+    "ORDER BY timestamp DESC, id DESC LIMIT ?"
+)
+
+PAGE_BEFORE_SQL = (
+    "SELECT id, role, content, timestamp, extra_data FROM chat_history "
+    "WHERE user_id = ? AND session_id = ? AND (timestamp, id) < (?, ?) "
+    "ORDER BY timestamp DESC, id DESC LIMIT ?"
+)
+
+EXPORT_SQL = (
+    "SELECT id, role, content, timestamp, extra_data FROM chat_history "
+    "WHERE user_id = ? AND session_id = ? "
+    "ORDER BY timestamp, id"
+)
+
+DELETE_SQL = "DELETE FROM chat_history WHERE user_id = ? AND session_id = ?"
+
+SUMMARY_UPSERT_SQL = (
+    "INSERT INTO chat_summary (user_id, session_id, summary, covered_until, updated_at) "
+    "VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (user_id, session_id) DO UPDATE SET "
+    "summary = excluded.summary, covered_until = excluded.covered_until, updated_at = excluded.updated_at"
+)
+
+SUMMARY_SQL = (
+    "SELECT summary, covered_until FROM chat_summary "
+    "WHERE user_id = ? AND session_id = ? AND updated_at >= ?"
+)
+
+SUMMARY_DELETE_SQL = "DELETE FROM chat_summary WHERE user_id = ? AND session_id = ?"
+
+
+def format_timestamp(value: datetime) -> str:
+    return value.strftime(TIMESTAMP_FORMAT)
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+class InvalidCursor(ValueError):
+    """Çözülemeyen history imleci"""
+
+
+def encode_cursor(timestamp: str, row_id: int) -> str:
+    """(timestamp, id) → URL'de taşınabilir opak imleç"""
+    return base64.urlsafe_b64encode(f"{timestamp}|{row_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Geçersiz imleçte InvalidCursor"""
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").rsplit("|", 1)
+        return timestamp, int(row_id)
+    except Exception as e:
+        raise InvalidCursor(f"Geçersiz imleç: {cursor}") from e
 
 
 class ChatDatabase:
-    """SQLite ile kalıcı chat hafızası"""
-    
-    def __init__(self, db_path: str = "D:/AI/backend/chat_history.db"):
-        self.engine = create_engine(f"sqlite:///{db_path}", echo=False)
-        Base.metadata.create_all(self.engine)
-        self.SessionLocal = sessionmaker(bind=self.engine)
-    
-    def save_message(
-        self, 
-        user_id: str, 
-        session_id: str, 
-        role: str, 
+    """
+    SQLite ile kalıcı chat hafızası (aiosqlite).
+    - WAL + ayarlı pragmalar; tek yazma bağlantısı, küçük bir okuma bağlantısı havuzu
+    - Her bağlantı kendi thread'inde çalışır, event loop bloklanmaz
+    - Yazmalar hazır ifadeyle toplu (executemany) ve tek transaction'da yapılır
+    - Okumalar ORM nesnesi değil satır tuple'ı döndürür
+    """
+
+    def __init__(self, db_path: str = "D:/AI/backend/chat_history.db", read_connections: int = READ_CONNECTIONS):
+        self.db_path = db_path
+        self.read_connections = read_connections
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._readers: "asyncio.Queue[aiosqlite.Connection]" = asyncio.Queue()
+        self._all_readers: List[aiosqlite.Connection] = []
+        self._write_lock = asyncio.Lock()
+        self._open_lock = asyncio.Lock()
+        self.stats = {"inserted": 0, "insert_batches": 0, "reads": 0, "deletes": 0, "exports": 0}
+
+    async def _connect(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.db_path)
+        for pragma in SQLITE_PRAGMAS:
+            await conn.execute(pragma)
+        return conn
+
+    async def start(self):
+        async with self._open_lock:
+            if self._writer is not None:
+                return
+            writer = await self._connect()
+            for statement in SCHEMA:
+                await writer.execute(statement)
+            await writer.commit()
+            for _ in range(self.read_connections):
+                reader = await self._connect()
+                await reader.execute("PRAGMA query_only=ON")
+                self._all_readers.append(reader)
+                self._readers.put_nowait(reader)
+            self._writer = writer
+            print(f"[CHAT_DB] 🗄️ SQLite açıldı (WAL, {self.read_connections} okuyucu): {self.db_path}")
+
+    async def stop(self):
+        async with self._open_lock:
+            if self._writer is None:
+                return
+            await self._writer.close()
+            for reader in self._all_readers:
+                await reader.close()
+            self._writer = None
+            self._all_readers = []
+            self._readers = asyncio.Queue()
+
+    async def _fetch(self, sql: str, params: tuple) -> List[tuple]:
+        if self._writer is None:
+            await self.start()
+        reader = await self._readers.get()
+        try:
+            async with reader.execute(sql, params) as cursor:
+                rows = await cursor.fetchall()
+        finally:
+            self._readers.put_nowait(reader)
+        self.stats["reads"] += 1
+        return rows
+
+    async def save_message(
+        self,
+        user_id: str,
+        session_id: str,
+        role: str,
         content: str,
         extra_data: Optional[Dict] = None
     ):
         """Mesajı veritabanına kaydet"""
-        session = self.SessionLocal()
         try:
-            msg = ChatHistory(
-                user_id=user_id,
-                session_id=session_id,
-                role=role,
-                content=content,
-                extra_data=json.dumps(extra_data or {})
-            )
-            session.add(msg)
-            session.commit()
+            await self.save_messages([{
+                "user_id": user_id,
+                "session_id": session_id,
+                "role": role,
+                "content": content,
+                "timestamp": datetime.now(),
+                "extra_data": json.dumps(extra_data or {})
+            }])
         except Exception as e:
             print(f"❌ Chat DB kayıt hatası: {e}")
-            session.rollback()
-        finally:
-            session.close()
-    
-    def get_history(
-        self, 
-        user_id: str, 
-        session_id: str, 
-        limit: int = 50
-    ) -> List[Dict]:
-        """Kullanıcının chat geçmişini getir"""
-        session = self.SessionLocal()
-        try:
-            messages = session.query(ChatHistory).filter(
-                ChatHistory.user_id == user_id,
-                ChatHistory.session_id == session_id
-            ).order_by(ChatHistory.timestamp.desc()).limit(limit).all()
-            
-            return [
-                {
-                    "role": msg.role,
-                    "content": msg.content,
-                    "timestamp": msg.timestamp.isoformat(),
-                    "metadata": json.loads(msg.extra_data)
-                }
-                for msg in reversed(messages)  # Eski → Yeni sıralama
-            ]
-        finally:
-            session.close()
-    
-    def clear_session(self, user_id: str, session_id: str):
-        """Belirli bir session'ı sil"""
-        session = self.SessionLocal()
+
+    async def save_messages(self, rows: List[Dict]):
+        """Birden çok mesajı tek transaction'da kaydet (write-behind flush'ı için)"""
+        if not rows:
+            return
+        if self._writer is None:
+            await self.start()
+        params = [
+            (
+                row["user_id"], row["session_id"], row["role"], row["content"],
+                format_timestamp(row["timestamp"]), row.get("extra_data") or "{}"
+            )
+            for row in rows
+        ]
+        async with self._write_lock:
+            try:
+                await self._writer.executemany(INSERT_SQL, params)
+                await self._writer.commit()
+            except Exception:
+                await self._writer.rollback()
+                raise
+        self.stats["inserted"] += len(params)
+        self.stats["insert_batches"] += 1
+
+    async def get_recent(
+        self,
+        user_id: str,
+        session_id: str,
+        since: datetime,
+        limit: int = 12
+    ) -> List[Tuple[str, str, datetime]]:
+        """Oturumun since'ten yeni son mesajları (role, content, timestamp), eski → yeni"""
+        rows = await self._fetch(RECENT_SQL, (user_id, session_id, format_timestamp(since), limit))
+        return [(role, content, parse_timestamp(ts)) for role, content, ts in reversed(rows)]
+
+    async def get_page(
+        self,
+        user_id: str,
+        session_id: str,
+        limit: int = 50,
+        before: Optional[str] = None
+    ) -> Tuple[List[Tuple[int, str, str, Optional[datetime], str]], Optional[str]]:
+        """
+        Geçmişin bir sayfası (id, role, content, timestamp, extra_data), eski → yeni.
+        before imlecinden daha eski mesajlar döner; ikinci değer bir sonraki (daha eski) sayfanın imleci.
+        """
+        if before:
+            timestamp, row_id = decode_cursor(before)
+            rows = await self._fetch(PAGE_BEFORE_SQL, (user_id, session_id, timestamp, row_id, limit + 1))
+        else:
+            rows = await self._fetch(PAGE_SQL, (user_id, session_id, limit + 1))
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][3], rows[-1][0])
+        page = [
+            (row_id, role, content, parse_timestamp(ts), extra)
+            for row_id, role, content, ts, extra in reversed(rows)
+        ]
+        return page, next_cursor
+
+    async def iter_history(
+        self,
+        user_id: str,
+        session_id: str,
+        fetch_rows: int = EXPORT_FETCH_ROWS
+    ) -> AsyncIterator[Tuple[int, str, str, Optional[datetime], str]]:
+        """
+        Oturumun tüm geçmişini eski → yeni sırayla, imleçten parça parça okuyarak üret.
+        Uzun export'lar okuma havuzunu meşgul etmesin diye ayrı bağlantı kullanılır.
+        """
+        if self._writer is None:
+            await self.start()
+        conn = await self._connect()
         try:
-            session.query(ChatHistory).filter(
-                ChatHistory.user_id == user_id,
-                ChatHistory.session_id == session_id
-            ).delete()
-            session.commit()
+            await conn.execute("PRAGMA query_only=ON")
+            async with conn.execute(EXPORT_SQL, (user_id, session_id)) as cursor:
+                while True:
+                    rows = await cursor.fetchmany(fetch_rows)
+                    if not rows:
+                        break
+                    for row_id, role, content, ts, extra in rows:
+                        yield row_id, role, content, parse_timestamp(ts), extra
         finally:
-            session.close()
-    
-    def export_history(self, user_id: str, session_id: str) -> str:
-        """Chat geçmişini JSON olarak export et"""
-        history = self.get_history(user_id, session_id, limit=1000)
-        return json.dumps(history, ensure_ascii=False, indent=2)
+            await conn.close()
+        self.stats["exports"] += 1
+
+    async def save_summary(self, user_id: str, session_id: str, summary: str, covered_until: datetime):
+        """Oturum özetini yaz (varsa üzerine)"""
+        if self._writer is None:
+            await self.start()
+        async with self._write_lock:
+            await self._writer.execute(SUMMARY_UPSERT_SQL, (
+                user_id, session_id, summary,
+                format_timestamp(covered_until), format_timestamp(datetime.now())
+            ))
+            await self._writer.commit()
+
+    async def get_summary(self, user_id: str, session_id: str, since: datetime) -> Optional[Tuple[str, datetime]]:
+        """since'ten sonra güncellenmiş özet (summary, covered_until)"""
+        rows = await self._fetch(SUMMARY_SQL, (user_id, session_id, format_timestamp(since)))
+        if not rows:
+            return None
+        summary, covered_until = rows[0]
+        return summary, parse_timestamp(covered_until)
+
+    async def clear_session(self, user_id: str, session_id: str):
+        """Belirli bir session'ı (mesajlar + özet) sil"""
+        if self._writer is None:
+            await self.start()
+        async with self._write_lock:
+            await self._writer.execute(DELETE_SQL, (user_id, session_id))
+            await self._writer.execute(SUMMARY_DELETE_SQL, (user_id, session_id))
+            await self._writer.commit()
+        self.stats["deletes"] += 1
+
+    def get_stats(self) -> dict:
+        return {
+            "open": self._writer is not None,
+            "idle_readers": self._readers.qsize(),
+            **self.stats
+        }
 
 
 # Global chat database instance
-chat_db = ChatDatabase()
\ No newline at end of file
+chat_db = ChatDatabase()
@@ -0,0 +1,215 @@
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from collections import deque
+from contextlib import aclosing
+from datetime import datetime
+import json
+import time
+import zlib
+import asyncio
+
+from services.chat_db import chat_db
+
+WRITE_BEHIND_BATCH = 200            # flush başına en fazla satır
+WRITE_BEHIND_INTERVAL = 0.5         # saniye - flush aralığı
+WRITE_BEHIND_MAX_PENDING = 20000    # dolunca en eski satırlar düşer
+HISTORY_PAGE_MAX = 500              # tek history sayfasında en fazla mesaj
+EXPORT_CHUNK_ROWS = 100             # export'ta tek parçada gönderilen satır
+
+
+class ChatWriteBehind:
+    """
+    Sohbet turlarını chat_db'ye istek yolunu bekletmeden yazar.
+    - enqueue senkron ve anında döner; satırlar bellekte kuyruğa girer
+    - Arka plan görevi kuyruğu toplu olarak, flush başına tek transaction'la yazar
+    - Yazma hatasında satırlar kuyruğun başına geri konur, sonraki turda yeniden denenir
+    """
+
+    def __init__(
+        self,
+        batch_size: int = WRITE_BEHIND_BATCH,
+        interval: float = WRITE_BEHIND_INTERVAL,
+        max_pending: int = WRITE_BEHIND_MAX_PENDING
+    ):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pending: deque = deque(maxlen=max_pending)
+        self.wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "enqueued": 0, "written": 0, "batches": 0, "failures": 0,
+            "dropped": 0, "flush_time_total": 0.0
+        }
+
+    def enqueue(self, user_id: str, session_id: str, role: str, content: str, created: float, extra_data: Optional[Dict] = None):
+        if len(self.pending) == self.pending.maxlen:
+            self.stats["dropped"] += 1
+        self.pending.append({
+            "user_id": user_id,
+            "session_id": session_id,
+            "role": role,
+            "content": content,
+            "timestamp": datetime.fromtimestamp(created),
+            "extra_data": json.dumps(extra_data or {})
+        })
+        self.stats["enqueued"] += 1
+        if len(self.pending) >= self.batch_size:
+            self.wakeup.set()
+
+    def pending_for(self, user_id: str, session_id: str, since: datetime) -> List[Tuple[str, str, datetime]]:
+        """Oturumun kuyrukta bekleyen turları (role, content, timestamp)"""
+        return [
+            (row["role"], row["content"], row["timestamp"])
+            for row in self.pending
+            if row["user_id"] == user_id and row["session_id"] == session_id and row["timestamp"] >= since
+        ]
+
+    async def flush(self):
+        """Kuyruktaki tüm satırları yaz (hidrasyon ve kapanış öncesi de çağrılır)"""
+        async with self._flush_lock:
+            while self.pending:
+                batch = [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+                started = time.perf_counter()
+                try:
+                    await chat_db.save_messages(batch)
+                except Exception as e:
+                    self.stats["failures"] += 1
+                    print(f"❌ Chat DB toplu kayıt hatası: {e}")
+                    self._requeue(batch)
+                    return
+                self.stats["batches"] += 1
+                self.stats["written"] += len(batch)
+                self.stats["flush_time_total"] += time.perf_counter() - started
+
+    def _requeue(self, batch: List[Dict]):
+        """Yazılamayan satırları başa geri koy; yer yoksa en eskilerini düşür ve say"""
+        free = self.pending.maxlen - len(self.pending)
+        if free < len(batch):
+            self.stats["dropped"] += len(batch) - free
+            batch = batch[len(batch) - free:] if free > 0 else []
+        self.pending.extendleft(reversed(batch))
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def get_stats(self) -> dict:
+        batches = self.stats["batches"]
+        return {
+            "pending": len(self.pending),
+            "enqueued": self.stats["enqueued"],
+            "written": self.stats["written"],
+            "batches": batches,
+            "avg_batch_size": round(self.stats["written"] / batches, 1) if batches else 0,
+            "avg_flush_ms": round(self.stats["flush_time_total"] / batches * 1000, 1) if batches else 0,
+            "failures": self.stats["failures"],
+            "dropped": self.stats["dropped"]
+        }
+
+
+# Global write-behind kuyruğu
+chat_writer = ChatWriteBehind()
+
+
+async def load_session(
+    user_id: str,
+    session_id: str,
+    since: datetime,
+    limit: int
+) -> Tuple[str, List[Tuple[str, str, datetime]]]:
+    """
+    Oturumu SQLite'tan yükle: (özet, özete girmemiş son turlar).
+    Kuyruk flush edilmez (istek yolunda global yazma beklenmez);
+    bu oturumun henüz yazılmamış turları DB satırlarıyla birleştirilir.
+    """
+    summary = ""
+    stored = await chat_db.get_summary(user_id, session_id, since)
+    if stored:
+        summary, covered_until = stored
+        since = max(since, covered_until)
+
+    pending = chat_writer.pending_for(user_id, session_id, since)
+    rows = await chat_db.get_recent(user_id, session_id, since, limit)
+    # Okuma sürerken flush edilen satırlar iki tarafta da görünebilir
+    seen = set(rows)
+    merged = rows + [row for row in pending if row not in seen]
+    if stored:
+        merged = [row for row in merged if row[2] > covered_until]
+    merged.sort(key=lambda row: row[2])
+    return summary, merged[-limit:]
+
+
+async def save_summary(user_id: str, session_id: str, summary: str, covered_until: datetime):
+    await chat_db.save_summary(user_id, session_id, summary, covered_until)
+
+
+async def clear_session(user_id: str, session_id: str):
+    await chat_writer.flush()
+    await chat_db.clear_session(user_id, session_id)
+
+
+def history_row(row_id: int, role: str, content: str, timestamp: Optional[datetime], extra: str) -> Dict:
+    return {
+        "id": row_id,
+        "role": role,
+        "content": content,
+        "timestamp": timestamp.isoformat() if timestamp else None,
+        "metadata": json.loads(extra or "{}")
+    }
+
+
+async def history_page(user_id: str, session_id: str, limit: int, before: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """Keyset sayfası (eski → yeni) ve bir önceki sayfanın imleci; geçersiz imleçte InvalidCursor"""
+    if not before:
+        await chat_writer.flush()
+    limit = max(1, min(limit, HISTORY_PAGE_MAX))
+    rows, next_cursor = await chat_db.get_page(user_id, session_id, limit, before)
+    return [history_row(*row) for row in rows], next_cursor
+
+
+async def export_ndjson(user_id: str, session_id: str, compress: bool = False) -> AsyncIterator[bytes]:
+    """
+    Oturum geçmişini satır başına bir JSON (NDJSON) olarak akıt.
+    Satırlar DB imlecinden parça parça okunur; bellekte en fazla bir parça tutulur.
+    """
+    await chat_writer.flush()
+    compressor = zlib.compressobj(wbits=31) if compress else None    # 31 → gzip başlığı
+    lines: List[str] = []
+
+    def encode(chunk: str) -> bytes:
+        data = chunk.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    async with aclosing(chat_db.iter_history(user_id, session_id)) as rows:
+        async for row in rows:
+            lines.append(json.dumps(history_row(*row), ensure_ascii=False))
+            if len(lines) >= EXPORT_CHUNK_ROWS:
+                data = encode("\n".join(lines) + "\n")
+                lines.clear()
+                if data:
+                    yield data
+
+    data = encode("\n".join(lines) + "\n") if lines else b""
+    if compressor:
+        data += compressor.flush()
+    if data:
+        yield data
@@ -0,0 +1,72 @@
+from typing import List
+import re
+
+# paraphrase-multilingual-MiniLM-L12-v2 en fazla 128 token görüyor (~500 karakter)
+CHUNK_MAX_CHARS = 500
+CHUNK_OVERLAP_CHARS = 120
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?…])\s+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def split_sentences(text: str, max_chars: int = CHUNK_MAX_CHARS) -> List[str]:
+    """Metni cümlelere böl; çok uzun cümleleri kelime sınırından parçala"""
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+    sentences = []
+
+    for sentence in _SENTENCE_END_RE.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            sentences.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            sentences.append(sentence)
+
+    return sentences
+
+
+def chunk_text(
+    text: str,
+    max_chars: int = CHUNK_MAX_CHARS,
+    overlap_chars: int = CHUNK_OVERLAP_CHARS
+) -> List[str]:
+    """
+    Cümle sınırlarına saygılı, örtüşen pencereler üret.
+    Her pencere bir öncekinin son ~overlap_chars kadar cümlesiyle başlar.
+    """
+    sentences = split_sentences(text, max_chars)
+    if not sentences:
+        return []
+
+    chunks: List[str] = []
+    window: List[str] = []
+    window_len = 0
+
+    for sentence in sentences:
+        if window and window_len + len(sentence) + 1 > max_chars:
+            chunks.append(" ".join(window))
+
+            # Örtüşme: sondan geriye doğru overlap_chars dolana kadar cümle taşı
+            carried: List[str] = []
+            carried_len = 0
+            for previous in reversed(window):
+                if carried_len + len(previous) > overlap_chars:
+                    break
+                carried.insert(0, previous)
+                carried_len += len(previous) + 1
+
+            # Taşınan kısım + yeni cümle pencereyi aşıyorsa örtüşmeyi baştan küçült
+            while carried and carried_len + len(sentence) + 1 > max_chars:
+                carried_len -= len(carried.pop(0)) + 1
+            window, window_len = carried, carried_len
+
+        window.append(sentence)
+        window_len += len(sentence) + 1
+
+    chunks.append(" ".join(window))
+    return chunks
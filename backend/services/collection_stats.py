@@ -0,0 +1,159 @@
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from collections import Counter
+from datetime import datetime
+import asyncio
+
+STATS_RECONCILE_INTERVAL = 60   # saniye
+
+
+class CollectionTally:
+    """Tarama sırasında yerelde biriken sayaçlar (bitince tek seferde devreye alınır)"""
+    __slots__ = ("chunks", "documents", "by_category", "by_source")
+
+    def __init__(self):
+        self.chunks = 0
+        self.documents = 0
+        self.by_category: Counter = Counter()
+        self.by_source: Counter = Counter()
+
+    def record_document(self, metadata: Dict, chunk_count: int = 1):
+        self.documents += 1
+        self.chunks += chunk_count
+        self.by_category[metadata.get("category", "general")] += 1
+        self.by_source[metadata.get("source", "unknown")] += 1
+
+    def record_chunks(self, chunk_count: int):
+        """Belge sayılmadan sadece parça ekle"""
+        self.chunks += chunk_count
+
+
+class CollectionStats:
+    """
+    Bilgi tabanı sayaçları (collection.count() çağırmadan).
+    - Parça ve belge sayısı yazımlarda artımlı güncellenir
+    - Kategori / kaynak bazlı belge sayıları tutulur
+    - Arka planda Chroma ile periyodik olarak uzlaştırılır; fark iki kontrol üst üste
+      sürerse (yazımı süren parçalar hariç) tam tarama yapılır
+    - Tarama yerel sayaçlara yapılır, canlı sayaçlar bitişte tek atamayla değişir
+    """
+
+    def __init__(self, interval: float = STATS_RECONCILE_INTERVAL):
+        self.interval = interval
+        self.chunks = 0
+        self.documents = 0
+        self.by_category: Counter = Counter()
+        self.by_source: Counter = Counter()
+        self.reconciliations = 0
+        self.last_drift = 0
+        self.last_reconciled: Optional[datetime] = None
+        self.pending_chunks = 0         # collection.add'i süren parçalar
+        self._writing: Counter = Counter()  # add'i süren belge ID'leri
+        self.rescans = 0
+        self._drift_seen = False
+        # Tarama sürerken kaydedilen belgeler (doc_id → metadata, parça sayısı)
+        self._scan_writes: Optional[Dict[str, Tuple[Dict, int]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def begin_write(self, doc_id: str, chunk_count: int):
+        self.pending_chunks += chunk_count
+        self._writing[doc_id] += 1
+
+    def end_write(self, doc_id: str, chunk_count: int):
+        self.pending_chunks -= chunk_count
+        self._writing[doc_id] -= 1
+        if self._writing[doc_id] <= 0:
+            del self._writing[doc_id]
+
+    def record_document(self, metadata: Dict, chunk_count: int = 1, doc_id: Optional[str] = None):
+        self.documents += 1
+        self.chunks += chunk_count
+        self.by_category[metadata.get("category", "general")] += 1
+        self.by_source[metadata.get("source", "unknown")] += 1
+        if self._scan_writes is not None and doc_id:
+            self._scan_writes[doc_id] = (metadata, chunk_count)
+
+    def begin_scan(self) -> CollectionTally:
+        self._scan_writes = {}
+        return CollectionTally()
+
+    def written_during_scan(self, doc_id: str) -> bool:
+        """Tarama sırasında yazılan / yazımı süren belge mi (taramada atlanır, kaydedildiyse bitişte eklenir)"""
+        return self._scan_writes is not None and (doc_id in self._scan_writes or doc_id in self._writing)
+
+    def finish_scan(self, tally: CollectionTally):
+        for metadata, chunk_count in (self._scan_writes or {}).values():
+            tally.record_document(metadata, chunk_count)
+        self.chunks, self.documents = tally.chunks, tally.documents
+        self.by_category, self.by_source = tally.by_category, tally.by_source
+        self._scan_writes = None
+        self.rescans += 1
+
+    def abort_scan(self):
+        self._scan_writes = None
+
+    async def reconcile(
+        self,
+        count_fn: Callable[[], Awaitable[int]],
+        rescan_fn: Optional[Callable[[], Awaitable[None]]] = None
+    ):
+        count = await count_fn()
+        drift = count - self.chunks
+        if 0 < drift <= self.pending_chunks:
+            drift = 0   # add tamamlandı, sayaç henüz güncellenmedi
+        self.last_drift = drift
+        # Tek seferlik fark yarış olabilir; iki kontrol üst üste sürerse düzelt
+        persistent = drift != 0 and self._drift_seen
+        self._drift_seen = drift != 0
+        if persistent:
+            if rescan_fn:
+                # Kategori sayıları da kaymış olabilir: tam metadata taraması
+                await rescan_fn()
+            else:
+                self.chunks = count
+            self._drift_seen = False
+        self.reconciliations += 1
+        self.last_reconciled = datetime.now()
+        if persistent:
+            print(f"[DB] 🔁 Sayaç uzlaştırıldı (fark: {drift:+d})")
+
+    async def _reconcile_loop(self, count_fn, rescan_fn):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reconcile(count_fn, rescan_fn)
+            except Exception as e:
+                print(f"[DB] ⚠️ Sayaç uzlaştırma hatası: {e}")
+
+    def start(
+        self,
+        count_fn: Callable[[], Awaitable[int]],
+        rescan_fn: Optional[Callable[[], Awaitable[None]]] = None
+    ):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._reconcile_loop(count_fn, rescan_fn))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> dict:
+        return {
+            "chunks": self.chunks,
+            "documents": self.documents,
+            "by_category": dict(self.by_category),
+            "by_source": dict(self.by_source),
+            "reconciliations": self.reconciliations,
+            "rescans": self.rescans,
+            "pending_chunks": self.pending_chunks,
+            "last_drift": self.last_drift,
+            "last_reconciled": self.last_reconciled.isoformat() if self.last_reconciled else None
+        }
+
+
+# Global bilgi tabanı sayaçları
+collection_stats = CollectionStats()
@@ -1,32 +1,23 @@
 import os
-from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
-from collections import OrderedDict
+import time
+import asyncio
+from typing import Dict, List, Optional, Callable
+from concurrent.futures import ThreadPoolExecutor
 
 import chromadb
-from sentence_transformers import SentenceTransformer
 
 from services.knowledge import stats
+from services.embedding import embedding_service
+from services.chunking import chunk_text
+from services.dedup import duplicate_index, simhash, content_hash
+from services.collection_stats import collection_stats
 
 DB_PATH = "D:/AI/backend/chroma_db"
-MAX_CACHE_SIZE = 100
+CHROMA_READ_WORKERS = 4
+INDEX_SCAN_PAGE = 5000
 
 os.makedirs(DB_PATH, exist_ok=True)
 
-print("=" * 60)
-print("🔄 Embedding model yükleniyor...")
-print("=" * 60)
-
-try:
-    embedding_model = SentenceTransformer(
-        'paraphrase-multilingual-MiniLM-L12-v2',
-        device='cpu'
-    )
-    print("✅ Embedding model hazır\n")
-except Exception as e:
-    print(f"❌ Embedding HATASI: {e}")
-    raise
-
 try:
     chroma_client = chromadb.PersistentClient(path=DB_PATH)
     collection = chroma_client.get_or_create_collection(
@@ -38,81 +29,273 @@ except Exception as e:
     print(f"❌ ChromaDB HATASI: {e}")
     raise
 
-# Basit LRU cache
-search_cache = OrderedDict()
 
+class AsyncCollection:
+    """
+    Chroma collection için async cephe.
+    - Okumalar (query/get/count) sınırlı bir thread havuzunda eşzamanlı çalışır
+    - Yazmalar (add/upsert/delete) tek thread'li havuzda sıraya girer
+    - Kuyrukta bekleme süresi ile sorgu süresi ayrı ölçülür
+    """
+
+    def __init__(self, collection, read_workers: int = CHROMA_READ_WORKERS):
+        self.collection = collection
+        self.read_executor = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="chroma-read")
+        self.write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chroma-write")
+        self.metrics: Dict[str, Dict[str, float]] = {}
+
+    def _record(self, op: str, queued: float, elapsed: float, failed: bool):
+        m = self.metrics.setdefault(op, {
+            "calls": 0, "errors": 0, "queue_time_total": 0.0, "query_time_total": 0.0, "query_time_max": 0.0
+        })
+        m["calls"] += 1
+        m["errors"] += int(failed)
+        m["queue_time_total"] += queued
+        m["query_time_total"] += elapsed
+        m["query_time_max"] = max(m["query_time_max"], elapsed)
+
+    async def _run(self, op: str, executor: ThreadPoolExecutor, fn: Callable, **kwargs):
+        submitted = time.perf_counter()
+        timing = {}
+
+        def call():
+            timing["started"] = time.perf_counter()
+            try:
+                return fn(**kwargs)
+            finally:
+                timing["finished"] = time.perf_counter()
+
+        failed = True
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(executor, call)
+            failed = False
+            return result
+        finally:
+            started = timing.get("started", submitted)
+            finished = timing.get("finished", started)
+            self._record(op, started - submitted, finished - started, failed)
+
+    # Okumalar
+    async def query(self, **kwargs) -> Dict:
+        return await self._run("query", self.read_executor, self.collection.query, **kwargs)
+
+    async def get(self, **kwargs) -> Dict:
+        return await self._run("get", self.read_executor, self.collection.get, **kwargs)
+
+    async def count(self) -> int:
+        return await self._run("count", self.read_executor, self.collection.count)
+
+    # Yazmalar
+    async def add(self, **kwargs):
+        return await self._run("add", self.write_executor, self.collection.add, **kwargs)
+
+    async def upsert(self, **kwargs):
+        return await self._run("upsert", self.write_executor, self.collection.upsert, **kwargs)
+
+    async def delete(self, **kwargs):
+        return await self._run("delete", self.write_executor, self.collection.delete, **kwargs)
 
-def create_embedding(text: str) -> List[float]:
-    """Metin için embedding oluştur"""
+    def shutdown(self):
+        self.read_executor.shutdown(wait=False)
+        self.write_executor.shutdown(wait=True)
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for op, m in self.metrics.items():
+            calls = m["calls"] or 1
+            result[op] = {
+                "calls": m["calls"],
+                "errors": m["errors"],
+                "avg_queue_ms": round(m["queue_time_total"] / calls * 1000, 2),
+                "avg_query_ms": round(m["query_time_total"] / calls * 1000, 2),
+                "max_query_ms": round(m["query_time_max"] * 1000, 2)
+            }
+        return result
+
+
+# Global async collection cephesi
+async_collection = AsyncCollection(collection)
+
+
+async def create_embedding(text: str) -> List[float]:
+    """Metin için embedding oluştur (mikro-batch servisi üzerinden)"""
     try:
-        return embedding_model.encode(text, show_progress_bar=False).tolist()
+        return await embedding_service.encode(text)
     except Exception as e:
         print(f"[EMBEDDING ERROR] {e}")
         return []
 
 
-def save_to_db(text: str, metadata: Dict, doc_id: str) -> bool:
-    """ChromaDB'ye kayıt - web_search.py tarafından kullanılıyor"""
+def chunk_id(doc_id: str, index: int) -> str:
+    return f"{doc_id}#c{index}"
+
+
+def parent_id_of(stored_id: str, metadata: Optional[Dict] = None) -> str:
+    """Parça ID'sinden ana belge ID'sini çıkar (eski tek parça kayıtlar kendisi)"""
+    if metadata and metadata.get("parent_id"):
+        return metadata["parent_id"]
+    return stored_id.split("#c", 1)[0]
+
+
+async def rebuild_indexes():
+    """
+    Açılışta bellek içi indeksleri collection'dan yeniden kur.
+    Sadece ID ve metadata sayfa sayfa okunur (embedding/doküman yok).
+    """
+    # Sayaçlar yerelde toplanır; tarama bitene kadar canlı sayaçlar (search_db) eski haliyle kalır
+    tally = collection_stats.begin_scan()
+    offset = 0
+    try:
+        while True:
+            page = await async_collection.get(include=["metadatas"], limit=INDEX_SCAN_PAGE, offset=offset)
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            for stored_id, meta in zip(ids, page.get("metadatas") or [{}] * len(ids)):
+                meta = meta or {}
+                parent_id = parent_id_of(stored_id, meta)
+                fingerprint = meta.get("simhash")
+                duplicate_index.add(parent_id, int(fingerprint, 16) if fingerprint else None)
+                if not meta.get("parent_id") and stored_id.startswith("web_") and meta.get("url"):
+                    # Eski kayıtlar web_{md5[:8]} ID'li: aynı URL yeni ID şemasıyla tekrar kaydedilmesin
+                    duplicate_index.add(f"web_{content_hash(meta['url'])}", None)
+                if collection_stats.written_during_scan(parent_id):
+                    continue    # save_to_db zaten saydı; bitişte eklenecek
+                if meta.get("chunk_index", 0) == 0:
+                    tally.record_document(meta)
+                else:
+                    tally.record_chunks(1)
+            offset += len(ids)
+    except Exception:
+        collection_stats.abort_scan()
+        raise
+    collection_stats.finish_scan(tally)
+
+    print(f"[DB] 🧭 İndeksler hazır ({len(duplicate_index.doc_ids)} belge, {offset} parça)")
+
+
+async def save_to_db(text: str, metadata: Dict, doc_id: str) -> bool:
+    """
+    ChromaDB'ye kayıt - main.py tarafından kullanılıyor.
+    Metin örtüşen parçalara bölünür; tek batch encode + tek collection.add yapılır.
+    Aynı ID bellek içi indeksle elenir; neredeyse aynı içerik (SimHash) kontrolü
+    yalnızca web kayıtlarına uygulanır (kullanıcı yüklemeleri sessizce düşmesin).
+    """
+    # Duplicate check (O(1), DB'ye gitmeden)
+    if not duplicate_index.reserve(doc_id):
+        print(f"[DB] ⚠️  {doc_id} zaten var")
+        return False
+
     try:
-        # Duplicate check
+        fingerprint = simhash(text)
+        near_duplicate = duplicate_index.find_near_duplicate(fingerprint) if metadata.get("source") == "web" else None
+        if near_duplicate:
+            duplicate_index.stats["near_duplicates_skipped"] += 1
+            duplicate_index.release(doc_id)
+            print(f"[DB] ⚠️  {doc_id} neredeyse aynı: {near_duplicate}")
+            return False
+
+        chunks = chunk_text(text)
+        if not chunks:
+            duplicate_index.release(doc_id)
+            return False
+
+        # Aynı anda gelen benzer sayfalar da birbirini görsün
+        duplicate_index.add(doc_id, fingerprint)
+
         try:
-            existing = collection.get(ids=[doc_id])
-            if existing and existing.get('ids'):
-                print(f"[DB] ⚠️  {doc_id} zaten var")
-                return False
-        except Exception:
-            pass
-
-        embedding = create_embedding(text)
-        if not embedding:
+            embeddings = await embedding_service.encode_many(chunks)
+        except Exception as e:
+            print(f"[EMBEDDING ERROR] {e}")
+            duplicate_index.release(doc_id)
             return False
 
-        collection.add(
-            embeddings=[embedding],
-            documents=[text],
-            metadatas=[metadata],
-            ids=[doc_id]
-        )
+        chunk_metadata = {**metadata, "parent_id": doc_id, "chunk_count": len(chunks)}
+        if fingerprint is not None:
+            chunk_metadata["simhash"] = format(fingerprint, "016x")
 
-        stats["db_size"] = collection.count()
-        print(f"[DB] ✅ {doc_id} kaydedildi (Toplam: {stats['db_size']})")
+        # add sürerken yapılan count() bu parçaları sayaç farkı saymasın
+        collection_stats.begin_write(doc_id, len(chunks))
+        try:
+            await async_collection.add(
+                embeddings=embeddings,
+                documents=chunks,
+                metadatas=[{**chunk_metadata, "chunk_index": i} for i in range(len(chunks))],
+                ids=[chunk_id(doc_id, i) for i in range(len(chunks))]
+            )
+        finally:
+            collection_stats.end_write(doc_id, len(chunks))
+
+        collection_stats.record_document(metadata, len(chunks), doc_id)
+        stats["db_size"] = collection_stats.chunks
+        print(f"[DB] ✅ {doc_id} kaydedildi ({len(chunks)} parça, Toplam: {stats['db_size']})")
         return True
 
     except Exception as e:
         print(f"[DB ERROR] {e}")
+        duplicate_index.release(doc_id)
         return False
 
 
-def search_db(query: str, n: int = 3, min_relevance: float = 50.0) -> List[Dict]:
-    """ChromaDB semantic search - main.py tarafından kullanılıyor"""
+def merge_chunk_hits(ids: List[str], documents: List[str], metadatas: List[Dict], relevances: List[float]) -> List[Dict]:
+    """Aynı belgeye ait parça sonuçlarını tek belgede birleştir (en iyi skor korunur)"""
+    parents: Dict[str, Dict] = {}
+
+    for chunk_key, doc, meta, relevance in zip(ids, documents, metadatas, relevances):
+        meta = meta or {}
+        parent_id = parent_id_of(chunk_key, meta)
+        parent = parents.get(parent_id)
+        if parent is None:
+            parent = parents[parent_id] = {"metadata": meta, "relevance": relevance, "chunks": {}}
+        parent["relevance"] = max(parent["relevance"], relevance)
+        parent["chunks"][meta.get("chunk_index", 0)] = doc
+
+    docs = []
+    for parent in parents.values():
+        metadata = {k: v for k, v in parent["metadata"].items() if k not in ("chunk_index", "chunk_count", "simhash")}
+        docs.append({
+            "content": " … ".join(parent["chunks"][i] for i in sorted(parent["chunks"])),
+            "metadata": metadata,
+            "relevance": parent["relevance"],
+            "matched_chunks": len(parent["chunks"])
+        })
+    return docs
+
+
+async def search_db(query: str, n: int = 3, min_relevance: float = 50.0) -> List[Dict]:
+    """
+    ChromaDB semantic search - main.py tarafından kullanılıyor.
+    Parça düzeyinde fazla sonuç çekilir, ardından ana belgede birleştirilir.
+    """
     try:
-        if collection.count() == 0:
+        total = collection_stats.chunks
+        if total == 0:
             return []
 
-        query_embedding = create_embedding(query)
+        query_embedding = await create_embedding(query)
         if not query_embedding:
             return []
 
-        results = collection.query(
+        results = await async_collection.query(
             query_embeddings=[query_embedding],
-            n_results=min(n, collection.count()),
+            n_results=min(n * 4, total),
             include=['documents', 'metadatas', 'distances']
         )
 
         docs = []
         if results['documents'] and results['documents'][0]:
-            for i, doc in enumerate(results['documents'][0]):
-                distance = results['distances'][0][i]
-                relevance = round((1 - distance) * 100, 1)
-
-                if relevance >= min_relevance:
-                    docs.append({
-                        "content": doc,
-                        "metadata": results['metadatas'][0][i],
-                        "relevance": relevance
-                    })
+            relevances = [round((1 - d) * 100, 1) for d in results['distances'][0]]
+            hits = [
+                (chunk_key, doc, meta, relevance)
+                for chunk_key, doc, meta, relevance in zip(
+                    results['ids'][0], results['documents'][0], results['metadatas'][0], relevances
+                )
+                if relevance >= min_relevance
+            ]
+            docs = merge_chunk_hits(*zip(*hits)) if hits else []
 
             docs.sort(key=lambda x: x['relevance'], reverse=True)
+            docs = docs[:n]
             if docs:
                 print(f"[DB] ✅ {len(docs)} kayıt (en iyi: {docs[0]['relevance']}%)")
 
@@ -121,27 +304,3 @@ def search_db(query: str, n: int = 3, min_relevance: float = 50.0) -> List[Dict]
     except Exception as e:
         print(f"[DB SEARCH ERROR] {e}")
         return []
-
-
-def manage_cache(key: str, value: Any = None) -> Optional[Any]:
-    """Thread-safe LRU cache - web_search.py tarafından kullanılıyor"""
-    global search_cache
-
-    if value is None:
-        # Get
-        if key in search_cache:
-            search_cache.move_to_end(key)
-            cached_time, cached_value = search_cache[key]
-            if datetime.now() - cached_time < timedelta(hours=1):
-                stats["cache_hits"] += 1
-                return cached_value
-            else:
-                del search_cache[key]
-        stats["cache_misses"] += 1
-        return None
-    else:
-        # Set
-        search_cache[key] = (datetime.now(), value)
-        if len(search_cache) > MAX_CACHE_SIZE:
-            search_cache.popitem(last=False)
-        return value
\ No newline at end of file
@@ -0,0 +1,124 @@
+from typing import Dict, List, Optional, Set
+import re
+import hashlib
+
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3
+NEAR_DUP_SIMILARITY = 0.90      # bu oranın üzerinde benzer sayfalar tekrar kaydedilmez
+MIN_SHINGLES = 8                # daha kısa metinlerde SimHash güvenilir değil
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def content_hash(value: str) -> str:
+    """Tam uzunlukta içerik hash'i (doc_id üretimi için)"""
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def simhash(text: str) -> Optional[int]:
+    """Kelime 3-gram'ları üzerinden 64 bit SimHash; kısa metinde None"""
+    words = _WORD_RE.findall(text.lower())
+    shingles = {
+        " ".join(words[i:i + SHINGLE_SIZE])
+        for i in range(max(len(words) - SHINGLE_SIZE + 1, 0))
+    }
+    if len(shingles) < MIN_SHINGLES:
+        return None
+
+    weights = [0] * SIMHASH_BITS
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class DuplicateIndex:
+    """
+    Bilgi tabanı yazımları için bellek içi tekrar indeksi.
+    - Belge ID'leri set içinde (O(1) kontrol, collection.get yok)
+    - SimHash parmak izleri bant tabanlı LSH ile aranır; pigeonhole gereği
+      max_distance+1 banttan en az biri benzer iki parmak izinde birebir eşleşir
+    """
+
+    def __init__(self, similarity: float = NEAR_DUP_SIMILARITY):
+        self.max_distance = int((1 - similarity) * SIMHASH_BITS)
+        self.band_count = self.max_distance + 1
+        self.band_bits = -(-SIMHASH_BITS // self.band_count)
+        self.doc_ids: Set[str] = set()
+        self.fingerprints: Dict[str, int] = {}
+        self.bands: List[Dict[int, Set[str]]] = [{} for _ in range(self.band_count)]
+        self.stats = {"duplicates_skipped": 0, "near_duplicates_skipped": 0}
+
+    def _band_keys(self, fingerprint: int) -> List[int]:
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (i * self.band_bits)) & mask for i in range(self.band_count)]
+
+    def has_id(self, doc_id: str) -> bool:
+        return doc_id in self.doc_ids
+
+    def reserve(self, doc_id: str) -> bool:
+        """ID'yi yazım öncesi ayır; zaten varsa False (eşzamanlı yazımlara karşı)"""
+        if doc_id in self.doc_ids:
+            self.stats["duplicates_skipped"] += 1
+            return False
+        self.doc_ids.add(doc_id)
+        return True
+
+    def release(self, doc_id: str):
+        """Yazım başarısız olursa ayrılan ID'yi geri bırak"""
+        self.doc_ids.discard(doc_id)
+        self._remove_fingerprint(doc_id)
+
+    def find_near_duplicate(self, fingerprint: Optional[int]) -> Optional[str]:
+        if fingerprint is None:
+            return None
+        seen: Set[str] = set()
+        for band, key in zip(self.bands, self._band_keys(fingerprint)):
+            for candidate in band.get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                if hamming_distance(fingerprint, self.fingerprints[candidate]) <= self.max_distance:
+                    return candidate
+        return None
+
+    def add(self, doc_id: str, fingerprint: Optional[int] = None):
+        self.doc_ids.add(doc_id)
+        if fingerprint is None or doc_id in self.fingerprints:
+            return
+        self.fingerprints[doc_id] = fingerprint
+        for band, key in zip(self.bands, self._band_keys(fingerprint)):
+            band.setdefault(key, set()).add(doc_id)
+
+    def _remove_fingerprint(self, doc_id: str):
+        fingerprint = self.fingerprints.pop(doc_id, None)
+        if fingerprint is None:
+            return
+        for band, key in zip(self.bands, self._band_keys(fingerprint)):
+            members = band.get(key)
+            if members:
+                members.discard(doc_id)
+                if not members:
+                    del band[key]
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "indexed_ids": len(self.doc_ids),
+            "indexed_fingerprints": len(self.fingerprints),
+            "max_hamming_distance": self.max_distance
+        }
+
+
+# Global tekrar indeksi
+duplicate_index = DuplicateIndex()
@@ -0,0 +1,203 @@
+from typing import Dict, List, Optional, Tuple
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from sentence_transformers import SentenceTransformer
+
+from services.embedding_cache import EmbeddingCache
+
+EMBEDDING_MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+EMBEDDING_MAX_BATCH = 32
+EMBEDDING_MAX_WAIT_MS = 5
+
+print("=" * 60)
+print("🔄 Embedding model yükleniyor...")
+print("=" * 60)
+
+try:
+    embedding_model = SentenceTransformer(
+        EMBEDDING_MODEL_NAME,
+        device='cpu'
+    )
+    print("✅ Embedding model hazır\n")
+except Exception as e:
+    print(f"❌ Embedding HATASI: {e}")
+    raise
+
+
+class EmbeddingService:
+    """
+    Mikro-batch embedding servisi.
+    - Eşzamanlı encode isteklerini birkaç ms içinde tek batch'te toplar
+    - Batch'i worker thread'de çalıştırır (event loop bloklanmaz)
+    - Batch boyutu, kuyruk bekleme süresi ve verim metriklerini tutar
+    - Aynı içerik cache'ten döner; uçuştaki aynı metin tek kez encode edilir
+    """
+
+    def __init__(
+        self,
+        model: SentenceTransformer,
+        cache: EmbeddingCache,
+        max_batch_size: int = EMBEDDING_MAX_BATCH,
+        max_wait_ms: float = EMBEDDING_MAX_WAIT_MS
+    ):
+        self.model = model
+        self.cache = cache
+        self.inflight: Dict[bytes, asyncio.Future] = {}
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        # Disk katmanı yazımları encode batch'lerinin önünde sıraya girmesin
+        self.persist_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-persist")
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.metrics = {
+            "requests": 0,
+            "encoded": 0,
+            "batches": 0,
+            "max_batch_size": 0,
+            "errors": 0,
+            "queue_wait_total": 0.0,
+            "encode_time_total": 0.0
+        }
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self.queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._worker())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.get_running_loop().run_in_executor(self.persist_executor, self.cache.flush)
+
+    async def encode(self, text: str) -> List[float]:
+        """Tek metni kuyruğa ekle ve batch sonucunu bekle"""
+        return (await self.encode_many([text]))[0]
+
+    async def encode_many(self, texts: List[str]) -> List[List[float]]:
+        """Birden çok metni aynı batch akışına ekle (önce cache'e bak)"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        self.metrics["requests"] += len(texts)
+
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        waiting: List[Tuple[int, asyncio.Future]] = []
+
+        for i, text in enumerate(texts):
+            key = self.cache.key(text)
+            future = self.inflight.get(key)
+            if future is None:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    results[i] = cached
+                    continue
+                future = loop.create_future()
+                future.add_done_callback(lambda f, k=key: self._on_encoded(k, f))
+                self.inflight[key] = future
+                self.queue.put_nowait((text, future, time.perf_counter()))
+            waiting.append((i, future))
+
+        if waiting:
+            # shield: bir çağıran iptal edilirse ortak future diğerleri için iptal olmasın
+            vectors = await asyncio.gather(*(asyncio.shield(future) for _, future in waiting))
+            for (i, _), vector in zip(waiting, vectors):
+                results[i] = vector
+
+        return results
+
+    def _on_encoded(self, key: bytes, future: asyncio.Future):
+        self.inflight.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            vector = future.result()
+            self.cache.put(key, vector)
+            if self.cache.disk:
+                # Memmap yazımı / msync / meta.json event loop'ta değil, kalıcılık thread'inde
+                self.persist_executor.submit(self.cache.persist, key, vector)
+
+    async def _collect_batch(self) -> List[Tuple[str, asyncio.Future, float]]:
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Hazırda bekleyenleri hemen al
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+            # İptal edilmiş istekleri encode etme
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+
+            try:
+                vectors = await loop.run_in_executor(
+                    self.executor,
+                    lambda: self.model.encode(
+                        [text for text, _, _ in batch],
+                        batch_size=len(batch),
+                        show_progress_bar=False
+                    )
+                )
+            except Exception as e:
+                self.metrics["errors"] += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.metrics["queue_wait_total"] += sum(started - queued for _, _, queued in batch)
+            self.metrics["encode_time_total"] += time.perf_counter() - started
+            self.metrics["batches"] += 1
+            self.metrics["encoded"] += len(batch)
+            self.metrics["max_batch_size"] = max(self.metrics["max_batch_size"], len(batch))
+
+            for (_, future, _), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector.tolist())
+
+    def get_stats(self) -> dict:
+        batches = self.metrics["batches"]
+        encoded = self.metrics["encoded"]
+        encode_time = self.metrics["encode_time_total"]
+        return {
+            "requests": self.metrics["requests"],
+            "encoded": encoded,
+            "batches": batches,
+            "errors": self.metrics["errors"],
+            "pending": self.queue.qsize() if self.queue else 0,
+            "avg_batch_size": round(encoded / batches, 2) if batches else 0,
+            "max_batch_size": self.metrics["max_batch_size"],
+            "avg_queue_wait_ms": round(self.metrics["queue_wait_total"] / encoded * 1000, 2) if encoded else 0,
+            "avg_encode_ms": round(encode_time / batches * 1000, 2) if batches else 0,
+            "throughput_per_sec": round(encoded / encode_time, 1) if encode_time else 0,
+            "inflight": len(self.inflight)
+        }
+
+
+# Global embedding servisi
+embedding_service = EmbeddingService(
+    embedding_model,
+    EmbeddingCache(EMBEDDING_MODEL_NAME, embedding_model.get_sentence_embedding_dimension())
+)
@@ -0,0 +1,226 @@
+from typing import Dict, List, Optional
+from array import array
+from collections import OrderedDict
+import os
+import re
+import json
+import hashlib
+import threading
+import unicodedata
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+EMBEDDING_CACHE_MAX_BYTES = 64 * 1024 * 1024           # RAM katmanı üst sınırı
+EMBEDDING_CACHE_DIR = "D:/AI/backend/embedding_cache"  # None → disk katmanı kapalı
+EMBEDDING_CACHE_DISK_ROWS = 100_000                    # disk katmanı kapasitesi (satır)
+EMBEDDING_CACHE_FLUSH_EVERY = 100                      # her N yazımda diske flush
+
+# array('f') nesnesi + OrderedDict girdisi için yaklaşık sabit maliyet
+_ENTRY_OVERHEAD = 160
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Aynı içeriğin farklı boşluk/Unicode biçimlerini tek anahtara indir"""
+    text = unicodedata.normalize("NFC", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def embedding_key(text: str, model_name: str) -> bytes:
+    """Model adı + normalize metin üzerinden 20 byte'lık içerik hash'i"""
+    return hashlib.sha1(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).digest()
+
+
+class DiskEmbeddingStore:
+    """
+    Memory-mapped float32 embedding deposu (yeniden başlatmada korunur).
+    - vectors.f32: (rows, dim) float32 matrisi
+    - keys.bin:    satır başına 20 byte içerik hash'i
+    - meta.json:   model, boyut, doluluk ve yazma imleci
+    Kapasite dolunca en eski satırların üzerine yazılır (halka tampon).
+    put/flush bloklayıcı disk I/O'dur; tek bir kalıcılık thread'inde çağrılır.
+    get event loop'tan kilitsiz okur: yazıcı satırı önce geçersiz kılar,
+    okuyucu kopyadan sonra anahtarın hâlâ aynı satırda olduğunu doğrular.
+    """
+
+    def __init__(self, path: str, dim: int, max_rows: int, model_name: str):
+        os.makedirs(path, exist_ok=True)
+        self.dim = dim
+        self.max_rows = max_rows
+        self.model_name = model_name
+        self.meta_path = os.path.join(path, "meta.json")
+        self.pending_writes = 0
+        self.lock = threading.Lock()
+
+        meta = {}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+
+        compatible = (
+            meta.get("model") == model_name and
+            meta.get("dim") == dim and
+            meta.get("max_rows") == max_rows
+        )
+        mode = "r+" if compatible else "w+"
+        self.count = meta.get("count", 0) if compatible else 0
+        self.next_row = meta.get("next_row", 0) if compatible else 0
+
+        self.vectors = np.memmap(
+            os.path.join(path, "vectors.f32"), dtype=np.float32, mode=mode, shape=(max_rows, dim)
+        )
+        self.keys = np.memmap(
+            os.path.join(path, "keys.bin"), dtype=np.uint8, mode=mode, shape=(max_rows, 20)
+        )
+        self.index: Dict[bytes, int] = {
+            self.keys[row].tobytes(): row for row in range(self.count)
+        }
+        print(f"[EMBED CACHE] 💾 Disk katmanı hazır ({self.count} kayıt)")
+
+    def get(self, key: bytes) -> Optional[List[float]]:
+        row = self.index.get(key)
+        if row is None:
+            return None
+        vector = self.vectors[row].tolist()
+        # Okuma sırasında satırın üzerine yazıldıysa kopya geçersiz
+        if self.index.get(key) != row or self.keys[row].tobytes() != key:
+            return None
+        return vector
+
+    def put(self, key: bytes, vector: List[float]):
+        if key in self.index or len(vector) != self.dim:
+            return
+
+        with self.lock:
+            row = self.next_row
+            if self.count == self.max_rows:
+                # Halka tampon: en eski kaydı düşür, vektörü yazmadan önce satırı geçersiz kıl
+                self.index.pop(self.keys[row].tobytes(), None)
+                self.keys[row] = 0
+            else:
+                self.count += 1
+
+            self.vectors[row] = vector
+            self.keys[row] = np.frombuffer(key, dtype=np.uint8)
+            self.index[key] = row
+            self.next_row = (row + 1) % self.max_rows
+
+        self.pending_writes += 1
+        if self.pending_writes >= EMBEDDING_CACHE_FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            count, next_row = self.count, self.next_row
+        self.vectors.flush()
+        self.keys.flush()
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "model": self.model_name,
+                "dim": self.dim,
+                "max_rows": self.max_rows,
+                "count": count,
+                "next_row": next_row
+            }, f)
+        self.pending_writes = 0
+
+
+class EmbeddingCache:
+    """
+    İçerik hash'li iki katmanlı embedding cache.
+    - RAM: byte bütçeli LRU (vektörler kompakt float32 array olarak)
+    - Disk: opsiyonel memory-mapped float32 deposu
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        dim: int,
+        max_bytes: int = EMBEDDING_CACHE_MAX_BYTES,
+        disk_path: Optional[str] = EMBEDDING_CACHE_DIR,
+        disk_rows: int = EMBEDDING_CACHE_DISK_ROWS
+    ):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.memory: "OrderedDict[bytes, array]" = OrderedDict()
+        self.bytes_used = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self.disk: Optional[DiskEmbeddingStore] = None
+        if disk_path and NUMPY_AVAILABLE:
+            try:
+                self.disk = DiskEmbeddingStore(disk_path, dim, disk_rows, model_name)
+            except Exception as e:
+                print(f"[EMBED CACHE] ⚠️ Disk katmanı devre dışı: {e}")
+
+    def key(self, text: str) -> bytes:
+        return embedding_key(text, self.model_name)
+
+    def _remember(self, key: bytes, vector: List[float]):
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return
+
+        packed = array("f", vector)
+        self.memory[key] = packed
+        self.bytes_used += len(packed) * packed.itemsize + _ENTRY_OVERHEAD
+
+        while self.bytes_used > self.max_bytes and self.memory:
+            _, evicted = self.memory.popitem(last=False)
+            self.bytes_used -= len(evicted) * evicted.itemsize + _ENTRY_OVERHEAD
+            self.stats["evictions"] += 1
+
+    def get(self, key: bytes) -> Optional[List[float]]:
+        packed = self.memory.get(key)
+        if packed is not None:
+            self.memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return packed.tolist()
+
+        if self.disk:
+            vector = self.disk.get(key)
+            if vector is not None:
+                self.stats["disk_hits"] += 1
+                self._remember(key, vector)
+                return vector
+
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key: bytes, vector: List[float]):
+        """Sadece RAM katmanı (event loop'ta çağrılır)"""
+        if not vector:
+            return
+        self._remember(key, vector)
+
+    def persist(self, key: bytes, vector: List[float]):
+        """Disk katmanına yaz - bloklayıcı, kalıcılık thread'inde çağrılır"""
+        if not vector or not self.disk:
+            return
+        try:
+            self.disk.put(key, vector)
+        except Exception as e:
+            print(f"[EMBED CACHE] ⚠️ Disk yazma hatası: {e}")
+
+    def flush(self):
+        """Bloklayıcı; kalıcılık thread'inde çağrılır"""
+        if self.disk:
+            self.disk.flush()
+
+    def get_stats(self) -> dict:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.bytes_used,
+            "memory_max_bytes": self.max_bytes,
+            "disk_entries": self.disk.count if self.disk else 0,
+            "disk_enabled": self.disk is not None
+        }
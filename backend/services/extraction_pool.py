@@ -0,0 +1,116 @@
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import os
+import time
+import asyncio
+
+from services.html_extract import extract_text
+
+EXTRACTION_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+EXTRACTION_MAX_PENDING = EXTRACTION_WORKERS * 4     # kuyrukta bekleyebilecek sayfa sayısı
+
+
+def _warm_worker():
+    """Worker açılışında lxml'i yükle ve bir kez parse et (ilk sayfa gecikmesiz olsun)"""
+    extract_text(b"<html><body><main>warm up</main></body></html>")
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class ExtractionPool:
+    """
+    HTML → metin çıkarma için process pool aşaması.
+    - Sabit sayıda worker, açılışta ısıtılır
+    - İçeri sadece ham baytlar gider, dışarı sadece metin döner
+    - Bekleyen iş sayısı sınırlı (dolunca çağıran bekler)
+
+    Not: Windows'ta (spawn) worker'lar __main__'i yeniden içe aktarır;
+    backend'i "python -m uvicorn main:app" ile başlatın.
+    """
+
+    def __init__(self, workers: int = EXTRACTION_WORKERS, max_pending: int = EXTRACTION_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.slots = asyncio.Semaphore(max_pending)
+        self.pending = 0
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "errors": 0,
+            "restarts": 0,
+            "queue_wait_total": 0.0,
+            "extract_time_total": 0.0
+        }
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+
+    async def start(self):
+        """Worker'ları önceden başlat (her birine bir ping gönder)"""
+        if self.executor is None:
+            self.executor = self._create_executor()
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(
+            *(loop.run_in_executor(self.executor, _ping) for _ in range(self.workers))
+        )
+        print(f"[EXTRACT] ✅ {len(set(pids))} worker hazır")
+
+    async def extract(self, raw: bytes, encoding: Optional[str] = None) -> str:
+        if self.executor is None:
+            self.executor = self._create_executor()
+
+        queued = time.perf_counter()
+        self.pending += 1
+        try:
+            async with self.slots:
+                started = time.perf_counter()
+                self.stats["queue_wait_total"] += started - queued
+                self.stats["submitted"] += 1
+                loop = asyncio.get_running_loop()
+                executor = self.executor
+                try:
+                    text = await loop.run_in_executor(executor, extract_text, raw, encoding)
+                except BrokenProcessPool:
+                    # Çöken worker'ı yenile (aynı çöküşü gören diğer çağrılar yeni havuzu kapatmasın),
+                    # bu sayfayı thread'de işle
+                    if self.executor is executor:
+                        self.stats["restarts"] += 1
+                        executor.shutdown(wait=False)
+                        self.executor = self._create_executor()
+                    text = await asyncio.to_thread(extract_text, raw, encoding)
+                except Exception:
+                    self.stats["errors"] += 1
+                    raise
+                self.stats["completed"] += 1
+                self.stats["extract_time_total"] += time.perf_counter() - started
+                return text
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def get_stats(self) -> dict:
+        completed = self.stats["completed"]
+        submitted = self.stats["submitted"]
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "submitted": submitted,
+            "completed": completed,
+            "errors": self.stats["errors"],
+            "restarts": self.stats["restarts"],
+            "avg_queue_wait_ms": round(self.stats["queue_wait_total"] / submitted * 1000, 1) if submitted else 0,
+            "avg_extract_ms": round(self.stats["extract_time_total"] / completed * 1000, 1) if completed else 0
+        }
+
+
+# Global HTML çıkarma havuzu
+extraction_pool = ExtractionPool()
@@ -0,0 +1,70 @@
+from typing import Optional
+import re
+
+from lxml import etree, html as lxml_html
+
+# ⚠️ Bu modül process pool worker'larında da yükleniyor: ağır import ekleme
+SCRAPE_MAX_CHARS = 8000             # sayfa başına saklanan metin
+SCRAPE_JUNK_TAGS = ('script', 'style', 'nav', 'footer', 'header', 'aside', 'iframe', 'noscript')
+
+_CHARSET_RE = re.compile(rb"""(?:charset|encoding)\s*=\s*["']?([A-Za-z0-9_.:-]+)""", re.IGNORECASE)
+_XML_DECL_RE = re.compile(r"^\s*<\?xml[^>]*\?>")
+
+
+def _decode_html(raw: bytes, encoding: Optional[str]) -> str:
+    """Header charset > meta/XML charset > UTF-8 > Windows-1254 sırasıyla çöz"""
+    sniffed = _CHARSET_RE.search(raw[:2048])
+    candidates = (encoding, sniffed.group(1).decode("ascii") if sniffed else None, "utf-8")
+
+    for candidate in filter(None, candidates):
+        try:
+            return raw.decode(candidate)
+        except UnicodeDecodeError as e:
+            # Bayt bütçesinde kesilen son çok baytlı karakteri at
+            if e.start >= len(raw) - 4:
+                return raw[:e.start].decode(candidate, errors="ignore")
+        except LookupError:
+            continue
+    return raw.decode("cp1254", errors="replace")
+
+
+def extract_text(raw: bytes, encoding: Optional[str] = None) -> str:
+    """HTML baytlarından ana metni lxml ile çıkar"""
+    # lxml, encoding bildirimi içeren str kabul etmiyor
+    html_text = _XML_DECL_RE.sub("", _decode_html(raw, encoding), count=1)
+    root = lxml_html.document_fromstring(html_text)
+
+    # Gereksiz elementleri temizle (C seviyesinde tek geçiş)
+    etree.strip_elements(root, *SCRAPE_JUNK_TAGS, etree.Comment, with_tail=False)
+
+    # Ana içeriği tek geçişte bul: main > article > div.content > body
+    candidates = {}
+    for element in root.iter('main', 'article', 'div', 'body'):
+        tag = element.tag
+        if tag == 'div':
+            if 'div' not in candidates and 'content' in (element.get('class') or '').split():
+                candidates['div'] = element
+        elif tag not in candidates:
+            candidates[tag] = element
+        if 'main' in candidates:
+            break
+
+    main = next((candidates[t] for t in ('main', 'article', 'div', 'body') if t in candidates), root)
+
+    # Metin bütçesi dolunca dur
+    parts = []
+    collected = 0
+    for fragment in main.itertext():
+        fragment = fragment.strip()
+        if not fragment:
+            continue
+        parts.append(fragment)
+        collected += len(fragment) + 1
+        if collected > SCRAPE_MAX_CHARS * 2:
+            break
+    text = ' '.join(parts)
+
+    # Temizle
+    lines = [l.strip() for l in text.split('\n') if l.strip() and len(l.strip()) > 20]
+    text = ' '.join(lines)
+    return text[:SCRAPE_MAX_CHARS]
@@ -0,0 +1,110 @@
+from typing import Dict, Any
+import importlib.util
+
+import httpx
+
+# HTTP/2 için "h2" paketi gerekiyor; yoksa sessizce HTTP/1.1'e düş
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+
+class HttpClientRegistry:
+    """
+    Servisler arası paylaşılan httpx.AsyncClient havuzları.
+    - Her servis (searxng, scrape, ollama) kendi havuzunu register_pool ile tanımlar
+    - Client'lar FastAPI lifespan içinde açılıp kapanır
+    - Yeni bağlantı / tekrar kullanım sayaçları tutulur
+    """
+
+    def __init__(self):
+        self.pool_configs: Dict[str, Dict[str, Any]] = {}
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        self.pool_stats: Dict[str, Dict[str, int]] = {}
+
+    def register_pool(
+        self,
+        name: str,
+        timeout: float = 15.0,
+        connect_timeout: float = 5.0,
+        max_connections: int = 20,
+        max_keepalive: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        **client_kwargs
+    ):
+        """Havuz ayarlarını kaydet (client ilk kullanımda / startup'ta açılır)"""
+        self.pool_configs[name] = {
+            "timeout": httpx.Timeout(timeout, connect=connect_timeout),
+            "limits": httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=keepalive_expiry
+            ),
+            "http2": http2 and HTTP2_AVAILABLE,
+            **client_kwargs
+        }
+        self.pool_stats.setdefault(name, {
+            "requests": 0,
+            "responses": 0,
+            "new_connections": 0
+        })
+
+    def _create_client(self, name: str) -> httpx.AsyncClient:
+        config = self.pool_configs[name]
+        counters = self.pool_stats[name]
+
+        async def trace(event_name: str, info: Dict):
+            # httpcore yalnızca yeni TCP bağlantısı kurarken bu olayı yayar
+            if event_name == "connection.connect_tcp.complete":
+                counters["new_connections"] += 1
+
+        async def on_request(request: httpx.Request):
+            counters["requests"] += 1
+            request.extensions["trace"] = trace
+
+        async def on_response(response: httpx.Response):
+            counters["responses"] += 1
+
+        client = httpx.AsyncClient(
+            event_hooks={"request": [on_request], "response": [on_response]},
+            **config
+        )
+        print(f"[HTTP] ✅ '{name}' havuzu açıldı (http2={config['http2']})")
+        return client
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """Havuz client'ını döndür; lifespan dışında çağrılırsa tembel oluştur"""
+        client = self.clients.get(name)
+        if client is None or client.is_closed:
+            client = self._create_client(name)
+            self.clients[name] = client
+        return client
+
+    async def startup(self):
+        for name in self.pool_configs:
+            self.get(name)
+
+    async def shutdown(self):
+        for name, client in list(self.clients.items()):
+            await client.aclose()
+            print(f"[HTTP] 🔌 '{name}' havuzu kapatıldı")
+        self.clients.clear()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for name, counters in self.pool_stats.items():
+            requests = counters["requests"]
+            reused = max(requests - counters["new_connections"], 0)
+            result[name] = {
+                **counters,
+                "reused_connections": reused,
+                "reuse_rate": round(reused / requests, 2) if requests else 0.0,
+                "open": name in self.clients and not self.clients[name].is_closed,
+                "http2": self.pool_configs[name]["http2"]
+            }
+        return result
+
+
+# Global HTTP havuz yöneticisi
+http_clients = HttpClientRegistry()
@@ -1,12 +1,65 @@
-from typing import Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from contextlib import asynccontextmanager
 import re
+import time
+import heapq
+import asyncio
+import itertools
+import json
 import httpx
 import random
 
+from services.http_clients import http_clients
+
 # ⚠️ MODEL ADINI KONTROL ET
 # "ollama list" komutunu çalıştır ve çıkan adı buraya yaz
 OLLAMA_MODEL = "dolphin-my-gguf:latest"  # Eğer farklıysa değiştir
 OLLAMA_TIMEOUT = 120
+OLLAMA_URL = "http://localhost:11434"
+OLLAMA_PROBE_TTL = 30          # saniye - hazır olma bilgisinin geçerlilik süresi
+OLLAMA_PROBE_INTERVAL = 15     # saniye - arka plan yenileme aralığı
+OLLAMA_KEEP_ALIVE = "30m"      # model + KV cache bellekte kalsın (oturum turları arası yeniden kullanım)
+OLLAMA_MAX_CONCURRENCY = 2     # CPU'da aynı anda çalışacak üretim sayısı
+OLLAMA_MAX_QUEUE = 16          # bekleyebilecek istek sayısı (dolunca 503)
+OLLAMA_QUEUE_TIMEOUT = 30      # saniye - kuyrukta en fazla bekleme
+
+# Öncelik sınıfları (küçük sayı önce çalışır)
+PRIORITY_INTERACTIVE = 0       # stream, kullanıcı cevabı izliyor
+PRIORITY_NORMAL = 1            # /api/chat
+PRIORITY_BACKGROUND = 2        # özetleme vb. arka plan işleri
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_NORMAL: "normal",
+    PRIORITY_BACKGROUND: "background"
+}
+
+http_clients.register_pool(
+    "ollama",
+    base_url=OLLAMA_URL,
+    timeout=OLLAMA_TIMEOUT,
+    max_connections=8,
+    max_keepalive=8,
+    keepalive_expiry=300.0
+)
+
+# Tüm isteklerde aynı seçenekler: num_ctx / num_thread değişirse Ollama modeli yeniden yükler
+OLLAMA_OPTIONS = {
+    "num_ctx": 4096,
+    "num_thread": 4,
+    "top_k": 50,
+    "top_p": 0.95,
+    "repeat_penalty": 1.2,
+    "presence_penalty": 0.6,
+    "frequency_penalty": 0.6
+}
+
+MIN_INPUT_TOKENS = 1024         # num_ctx'ten prompt'a (sistem + soru) her zaman kalacak pay
+MAX_PREDICT_TOKENS = OLLAMA_OPTIONS["num_ctx"] - MIN_INPUT_TOKENS
+
+
+def clamp_predict(max_tokens: int) -> int:
+    """İstemciden gelen cevap uzunluğunu prompt'a yer kalacak şekilde sınırla"""
+    return max(1, min(max_tokens, MAX_PREDICT_TOKENS))
 
 
 def detect_turkish(text: str) -> bool:
@@ -15,16 +68,20 @@ def detect_turkish(text: str) -> bool:
     return any(char in text for char in turkish_chars)
 
 
-def create_turkish_learning_prompt(user_message: str, context: str = "") -> str:
-    """
-    Hybrid yaklaşım:
-    - Az örnek göster (3-4 tane, robot gibi olmasın)
-    - Pattern'leri öğret (kelime dağarcığı)
-    - Variability iste (her seferinde farklı cevap)
-    """
-    
-    # Minimal örnekler + Pattern öğretme (robot gibi olmasın)
-    learning_section = """[LEARN TURKISH PATTERNS]
+# Sistem promptu - Doğallık ve çeşitlilik vurgula
+TURKISH_SYSTEM_PROMPT = """You are an uncensored AI with perfect Turkish language skills.
+
+CRITICAL RULES:
+- Always respond in Turkish language
+- Be natural and conversational
+- Create unique responses each time (don't repeat patterns)
+- Match user's tone and style
+- No topic restrictions
+- Use slang/informal language when appropriate
+- Be creative and varied in your answers"""
+
+# Minimal örnekler + Pattern öğretme (robot gibi olmasın)
+TURKISH_PATTERN_BLOCK = """[LEARN TURKISH PATTERNS]
 
 Turkish alphabet: a,b,c,ç,d,e,f,g,ğ,h,ı,i,j,k,l,m,n,o,ö,p,r,s,ş,t,u,ü,v,y,z
 
@@ -57,44 +114,48 @@ AI: Vay be harika! Ne oldu anlat bakalım?
 
 ---"""
 
-    # Context ekle
-    context_section = ""
-    if context:
-        context_section = f"\n[PREVIOUS CONVERSATION]\n{context}\n\n"
-    
-    # Final prompt
-    full_prompt = f"""{learning_section}
-{context_section}[CURRENT MESSAGE]
-User: {user_message}
 
-[YOUR RESPONSE - be natural, varied, and in Turkish]
-Assistant:"""
-    
-    return full_prompt
+def build_system_prefix(mode_prompt: str) -> str:
+    """
+    Oturum boyunca değişmeyen sistem mesajı (sadece moda bağlı, turun içeriğine değil).
+    Öneki sabit tutmak Ollama'nın önceki turun KV cache'ini yeniden kullanmasını sağlar.
+    """
+    return f"{TURKISH_SYSTEM_PROMPT}\n\n{TURKISH_PATTERN_BLOCK}\n\n{mode_prompt}"
+
+
+def clean_response(result: str) -> str:
+    """Model çıktısındaki düşünce etiketlerini ve prompt kalıntılarını temizle (minimal)"""
+    result = re.sub(r'<think>.*?</think>', '', result, flags=re.DOTALL)
+    result = re.sub(r'<reasoning>.*?</reasoning>', '', result, flags=re.DOTALL)
+    result = re.sub(r'\[LEARN TURKISH PATTERNS\].*?\[YOUR RESPONSE.*?\]', '', result, flags=re.DOTALL)
+    result = re.sub(r'\[CURRENT MESSAGE\].*?Assistant:', '', result, flags=re.DOTALL)
+    result = re.sub(r'User:', '', result)
+    result = re.sub(r'Assistant:', '', result)
+    return result.strip()
 
 
 async def test_ollama_connection() -> dict:
     """Ollama bağlantısını test et"""
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            # 1. Ollama çalışıyor mu?
-            response = await client.get("http://localhost:11434/api/tags")
+        client = http_clients.get("ollama")
+        # 1. Ollama çalışıyor mu?
+        response = await client.get("/api/tags", timeout=10)
+        
+        if response.status_code == 200:
+            data = response.json()
+            models = [model.get("name") for model in data.get("models", [])]
             
-            if response.status_code == 200:
-                data = response.json()
-                models = [model.get("name") for model in data.get("models", [])]
-                
-                return {
-                    "status": "ok",
-                    "available_models": models,
-                    "target_model": OLLAMA_MODEL,
-                    "model_exists": OLLAMA_MODEL in models
-                }
-            else:
-                return {
-                    "status": "error",
-                    "message": f"Ollama HTTP {response.status_code}"
-                }
+            return {
+                "status": "ok",
+                "available_models": models,
+                "target_model": OLLAMA_MODEL,
+                "model_exists": OLLAMA_MODEL in models
+            }
+        else:
+            return {
+                "status": "error",
+                "message": f"Ollama HTTP {response.status_code}"
+            }
     except Exception as e:
         return {
             "status": "error",
@@ -102,133 +163,449 @@ async def test_ollama_connection() -> dict:
         }
 
 
-async def chat_ollama(
-    prompt: str,
-    system: str = "",
+class OllamaReadiness:
+    """
+    Ollama hazır olma durumunu önbellekte tutar.
+    - Her üretimde /api/tags çağırmak yerine TTL'li sonucu döndürür
+    - Ollama kapalıysa TTL dolana kadar hızlıca hata verir
+    - Üretim hatasından sonra önbelleği geçersiz kılar, sonraki çağrı yeniden yoklar
+    - Arka planda periyodik olarak yenilenir (lifespan içinde başlatılır)
+    """
+
+    def __init__(self, ttl: float = OLLAMA_PROBE_TTL, interval: float = OLLAMA_PROBE_INTERVAL):
+        self.ttl = ttl
+        self.interval = interval
+        self.state: dict = {"status": "unknown", "message": "Henüz kontrol edilmedi"}
+        self.checked_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.probes = 0
+        self.cache_hits = 0
+        self.invalidations = 0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def is_fresh(self) -> bool:
+        return self.checked_at is not None and time.monotonic() - self.checked_at < self.ttl
+
+    async def probe(self) -> dict:
+        result = await test_ollama_connection()
+        self.probes += 1
+        self.state = result
+        self.checked_at = time.monotonic()
+        if result["status"] == "error":
+            self.last_error = result["message"]
+        return result
+
+    async def get_status(self) -> dict:
+        """Önbellekteki durumu döndür; bayatsa tek bir yoklama yap"""
+        if self.is_fresh():
+            self.cache_hits += 1
+            return self.state
+
+        async with self._lock:
+            # Kilidi beklerken başka bir istek yoklamış olabilir
+            if self.is_fresh():
+                self.cache_hits += 1
+                return self.state
+            return await self.probe()
+
+    def invalidate(self, reason: str = ""):
+        """Üretim hatasından sonra çağrılır; sonraki istek yeniden yoklar"""
+        self.checked_at = None
+        self.invalidations += 1
+        if reason:
+            self.last_error = reason
+
+    def describe(self) -> str:
+        status = self.state.get("status")
+        if status == "unknown":
+            return "BİLİNMİYOR"
+        if status == "error":
+            return "❌ Erişilemiyor"
+        if not self.state.get("model_exists", False):
+            return f"⚠️ Model yok ({OLLAMA_MODEL})"
+        return "✅ Aktif"
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.probe()
+            except Exception as e:
+                print(f"[LLM] ⚠️ Hazırlık yoklaması hatası: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> dict:
+        return {
+            "status": self.state.get("status"),
+            "model_exists": self.state.get("model_exists", False),
+            "available_models": self.state.get("available_models", []),
+            "last_error": self.last_error,
+            "age_seconds": round(time.monotonic() - self.checked_at, 1) if self.checked_at else None,
+            "probes": self.probes,
+            "cache_hits": self.cache_hits,
+            "invalidations": self.invalidations
+        }
+
+
+# Global Ollama hazırlık önbelleği
+ollama_readiness = OllamaReadiness()
+
+
+class LLMOverloaded(Exception):
+    """Üretim kuyruğu dolu veya bekleme süresi aşıldı (HTTP 503'e çevrilir)"""
+
+
+class LLMScheduler:
+    """
+    Ollama için kabul kontrolü.
+    - Aynı anda en fazla max_concurrency üretim
+    - Bekleyenler öncelik sırasıyla (aynı öncelikte FIFO) slot alır
+    - Kuyruk doluysa istek beklemeden LLMOverloaded ile reddedilir;
+      arka plan işleri kuyruğun yalnızca yarısını kullanabilir
+    - Sınıf bazında kuyruk bekleme ve servis süresi tutulur
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = OLLAMA_MAX_CONCURRENCY,
+        max_queue: int = OLLAMA_MAX_QUEUE,
+        queue_timeout: float = OLLAMA_QUEUE_TIMEOUT
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.waiters: list = []         # heap: (öncelik, sıra, future)
+        self._seq = itertools.count()
+        self.metrics = {
+            name: {
+                "admitted": 0, "rejected": 0, "timeouts": 0,
+                "wait_total": 0.0, "wait_max": 0.0,
+                "service_total": 0.0, "completed": 0
+            }
+            for name in PRIORITY_NAMES.values()
+        }
+
+    def _queue_limit(self, priority: int) -> int:
+        return self.max_queue // 2 if priority == PRIORITY_BACKGROUND else self.max_queue
+
+    def ensure_capacity(self, priority: int = PRIORITY_NORMAL):
+        """Kuyruk doluysa hemen reddet (stream başlamadan 503 dönebilmek için)"""
+        if self.active < self.max_concurrency and not self.waiting:
+            return
+        if self.waiting >= self._queue_limit(priority):
+            self.metrics[PRIORITY_NAMES[priority]]["rejected"] += 1
+            raise LLMOverloaded(f"LLM kuyruğu dolu ({self.waiting} bekleyen)")
+
+    def _release(self):
+        # Slotu sıradaki bekleyene devret; bekleyen yoksa serbest bırak
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                self.waiting -= 1
+                future.set_result(True)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_NORMAL):
+        m = self.metrics[PRIORITY_NAMES[priority]]
+        queued = time.perf_counter()
+
+        if self.active < self.max_concurrency and not self.waiting:
+            self.active += 1
+        else:
+            self.ensure_capacity(priority)
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self.waiters, (priority, next(self._seq), future))
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            try:
+                await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if future.done() and not future.cancelled():
+                    # Slot tam bu sırada verildi; kullanmadan devret
+                    self._release()
+                else:
+                    future.cancel()
+                    self.waiting -= 1
+                if isinstance(e, asyncio.TimeoutError):
+                    m["timeouts"] += 1
+                    raise LLMOverloaded(f"LLM kuyruğunda {self.queue_timeout}s beklendi") from None
+                raise
+
+        wait = time.perf_counter() - queued
+        m["admitted"] += 1
+        m["wait_total"] += wait
+        m["wait_max"] = max(m["wait_max"], wait)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            m["service_total"] += time.perf_counter() - started
+            m["completed"] += 1
+            self._release()
+
+    def get_stats(self) -> dict:
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.waiting,
+            "max_queue": self.max_queue,
+            "max_queue_depth": self.max_waiting,
+            "classes": {
+                name: {
+                    "admitted": m["admitted"],
+                    "rejected": m["rejected"],
+                    "timeouts": m["timeouts"],
+                    "avg_wait_ms": round(m["wait_total"] / m["admitted"] * 1000, 1) if m["admitted"] else 0,
+                    "max_wait_ms": round(m["wait_max"] * 1000, 1),
+                    "avg_service_ms": round(m["service_total"] / m["completed"] * 1000, 1) if m["completed"] else 0
+                }
+                for name, m in self.metrics.items()
+            }
+        }
+
+
+# Global LLM zamanlayıcısı
+llm_scheduler = LLMScheduler()
+
+
+async def _readiness_error() -> Optional[str]:
+    """Ollama veya model hazır değilse kullanıcıya gösterilecek hata metni"""
+    connection_test = await ollama_readiness.get_status()
+
+    if connection_test["status"] == "error":
+        error_msg = connection_test["message"]
+        print(f"[LLM] ❌ HATA: {error_msg}")
+        return f"❌ Ollama Hatası: {error_msg}\n\nÇözüm:\n1. Terminalde 'ollama serve' çalıştır\n2. 'ollama list' ile modeli kontrol et"
+
+    if not connection_test.get("model_exists", False):
+        available = ", ".join(connection_test.get("available_models", []))
+        print(f"[LLM] ❌ Model '{OLLAMA_MODEL}' bulunamadı!")
+        print(f"[LLM] 📋 Mevcut modeller: {available}")
+        return f"❌ Model Hatası: '{OLLAMA_MODEL}' bulunamadı!\n\nMevcut modeller: {available}\n\nÇözüm: llm.py dosyasında OLLAMA_MODEL değişkenini düzelt"
+
+    return None
+
+
+class PromptEvalStats:
+    """
+    Ollama cevabındaki prompt_eval / eval sayaçlarını toplar.
+    KV cache yeniden kullanıldığında prompt_eval_count sadece yeni tokenları sayar.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.prompt_ns = 0
+        self.eval_tokens = 0
+        self.eval_ns = 0
+        self.cold_loads = 0
+
+    def record(self, data: dict) -> Dict[str, float]:
+        usage = {
+            "prompt_eval_count": data.get("prompt_eval_count", 0) or 0,
+            "prompt_eval_ms": round((data.get("prompt_eval_duration", 0) or 0) / 1e6, 1),
+            "eval_count": data.get("eval_count", 0) or 0,
+            "eval_ms": round((data.get("eval_duration", 0) or 0) / 1e6, 1),
+            "load_ms": round((data.get("load_duration", 0) or 0) / 1e6, 1)
+        }
+        self.requests += 1
+        self.prompt_tokens += usage["prompt_eval_count"]
+        self.prompt_ns += data.get("prompt_eval_duration", 0) or 0
+        self.eval_tokens += usage["eval_count"]
+        self.eval_ns += data.get("eval_duration", 0) or 0
+        # keep_alive dolduysa model diskten yeniden yüklenir
+        if usage["load_ms"] > 1000:
+            self.cold_loads += 1
+        print(
+            f"[LLM] 📈 prompt_eval: {usage['prompt_eval_count']} token / {usage['prompt_eval_ms']}ms, "
+            f"eval: {usage['eval_count']} token / {usage['eval_ms']}ms"
+        )
+        return usage
+
+    def get_stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "avg_prompt_eval_tokens": round(self.prompt_tokens / self.requests, 1) if self.requests else 0,
+            "avg_prompt_eval_ms": round(self.prompt_ns / self.requests / 1e6, 1) if self.requests else 0,
+            "prompt_tokens_per_sec": round(self.prompt_tokens / (self.prompt_ns / 1e9), 1) if self.prompt_ns else 0,
+            "eval_tokens_per_sec": round(self.eval_tokens / (self.eval_ns / 1e9), 1) if self.eval_ns else 0,
+            "cold_loads": self.cold_loads
+        }
+
+
+# Global prompt değerlendirme istatistikleri
+prompt_eval_stats = PromptEvalStats()
+
+
+def build_chat_messages(mode_prompt: str, history: List[Dict], user_content: str) -> Tuple[List[Dict], bool]:
+    """
+    /api/chat için mesaj listesi: [sabit sistem öneki, önceki turlar..., bu tur]
+    Değişken kısım (kaynaklar + soru) yalnızca son mesajda olur.
+    Türkçe tespiti sadece sıcaklık ayarı için döner; sistem öneki her turda aynıdır.
+    """
+    turkish = detect_turkish(user_content)
+    messages = [{"role": "system", "content": build_system_prefix(mode_prompt)}]
+    messages.extend(history)
+    messages.append({"role": "user", "content": user_content})
+    return messages, turkish
+
+
+def _chat_payload(messages: List[Dict], temperature: float, max_tokens: int, stream: bool) -> Dict:
+    return {
+        "model": OLLAMA_MODEL,
+        "messages": messages,
+        "stream": stream,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "options": {
+            **OLLAMA_OPTIONS,
+            "temperature": temperature,
+            "num_predict": clamp_predict(max_tokens)
+        }
+    }
+
+
+async def chat_ollama_messages(
+    mode_prompt: str,
+    history: List[Dict],
+    user_content: str,
     temperature: float = 0.3,
-    max_tokens: int = 400
+    max_tokens: int = 400,
+    priority: int = PRIORITY_NORMAL,
+    usage: Optional[Dict] = None
 ) -> str:
     """
-    Ollama ile text üretimi - Hybrid Turkish support + Debug
+    Ollama /api/chat ile üretim (yapılandırılmış mesajlar, sabit sistem öneki)
+    usage verilirse prompt_eval / eval sayaçlarıyla doldurulur
+    Kuyruk doluysa LLMOverloaded yükseltir
     """
     try:
-        # İlk istek: Ollama'yı test et
-        connection_test = await test_ollama_connection()
-        
-        if connection_test["status"] == "error":
-            error_msg = connection_test["message"]
-            print(f"[LLM] ❌ HATA: {error_msg}")
-            return f"❌ Ollama Hatası: {error_msg}\n\nÇözüm:\n1. Terminalde 'ollama serve' çalıştır\n2. 'ollama list' ile modeli kontrol et"
-        
-        if not connection_test.get("model_exists", False):
-            available = ", ".join(connection_test.get("available_models", []))
-            print(f"[LLM] ❌ Model '{OLLAMA_MODEL}' bulunamadı!")
-            print(f"[LLM] 📋 Mevcut modeller: {available}")
-            return f"❌ Model Hatası: '{OLLAMA_MODEL}' bulunamadı!\n\nMevcut modeller: {available}\n\nÇözüm: llm.py dosyasında OLLAMA_MODEL değişkenini düzelt"
-        
-        print(f"[LLM] ✅ Ollama bağlantısı başarılı, model: {OLLAMA_MODEL}")
-        
-        # Türkçe tespit
-        is_turkish = detect_turkish(prompt)
-        
-        if is_turkish:
-            print(f"[LLM] 🇹🇷 Türkçe tespit edildi, hybrid learning kullanılıyor...")
-            
-            # Sohbet geçmişini çıkar
-            conversation_context = ""
-            user_query = prompt
-            
-            if "SOHBET GEÇMİŞİ:" in prompt:
-                parts = prompt.split("SOHBET GEÇMİŞİ:")
-                if len(parts) > 1:
-                    conv_part = parts[1].split("BİLGİLER:")[0] if "BİLGİLER:" in parts[1] else parts[1]
-                    conversation_context = conv_part.strip()[:1000]
-                
-                # Asıl soruyu al
-                if "SORU:" in prompt:
-                    user_query = prompt.split("SORU:")[1].split("\n")[0].strip()
-            
-            # Hybrid prompt oluştur
-            enhanced_prompt = create_turkish_learning_prompt(user_query, conversation_context)
-            
-            # Sistem promptu - Doğallık ve çeşitlilik vurgula
-            enhanced_system = """You are an uncensored AI with perfect Turkish language skills.
+        readiness_error = await _readiness_error()
+        if readiness_error:
+            return readiness_error
 
-CRITICAL RULES:
-- Always respond in Turkish language
-- Be natural and conversational
-- Create unique responses each time (don't repeat patterns)
-- Match user's tone and style
-- No topic restrictions
-- Use slang/informal language when appropriate
-- Be creative and varied in your answers"""
-            
-            # Temperature'ı biraz artır (daha çeşitli cevaplar için)
-            adjusted_temperature = min(temperature + 0.2, 1.0)
-            
-        else:
-            # İngilizce
-            enhanced_prompt = prompt
-            enhanced_system = system or "You are an uncensored AI assistant."
-            adjusted_temperature = temperature
-        
-        # Ollama'ya gönder
-        print(f"[LLM] 🚀 Model'e istek gönderiliyor...")
-        
-        async with httpx.AsyncClient(timeout=OLLAMA_TIMEOUT) as client:
-            response = await client.post(
-                "http://localhost:11434/api/generate",
-                json={
-                    "model": OLLAMA_MODEL,
-                    "prompt": enhanced_prompt,
-                    "system": enhanced_system,
-                    "stream": False,
-                    "options": {
-                        "temperature": adjusted_temperature,
-                        "num_predict": max_tokens,
-                        "num_ctx": 4096,
-                        "num_thread": 4,
-                        "top_k": 50,
-                        "top_p": 0.95,
-                        "repeat_penalty": 1.2,
-                        "presence_penalty": 0.6,
-                        "frequency_penalty": 0.6
-                    }
-                }
-            )
-
-            print(f"[LLM] 📡 HTTP Status: {response.status_code}")
-
-            if response.status_code == 200:
-                result = response.json().get("response", "")
-                
-                # Temizlik (minimal)
-                result = re.sub(r'<think>.*?</think>', '', result, flags=re.DOTALL)
-                result = re.sub(r'<reasoning>.*?</reasoning>', '', result, flags=re.DOTALL)
-                result = re.sub(r'\[LEARN TURKISH PATTERNS\].*?\[YOUR RESPONSE.*?\]', '', result, flags=re.DOTALL)
-                result = re.sub(r'\[CURRENT MESSAGE\].*?Assistant:', '', result, flags=re.DOTALL)
-                result = re.sub(r'User:', '', result)
-                result = re.sub(r'Assistant:', '', result)
-                
-                cleaned_result = result.strip()
-                
-                if cleaned_result:
-                    print(f"[LLM] ✅ Cevap: {cleaned_result[:80]}...")
-                    return cleaned_result
-                else:
-                    return "Cevap üretilemedi."
-            
-            elif response.status_code == 404:
-                return f"❌ 404 Hatası: Model '{OLLAMA_MODEL}' bulunamadı!\n\nÇözüm:\n1. 'ollama list' komutunu çalıştır\n2. Model adını kontrol et\n3. llm.py'de OLLAMA_MODEL değişkenini düzelt"
-            
-            else:
-                error_text = response.text
-                print(f"[LLM] ❌ HTTP {response.status_code}: {error_text}")
-                return f"Ollama HTTP {response.status_code}: {error_text}"
+        messages, turkish = build_chat_messages(mode_prompt, history, user_content)
+        # Türkçe: daha çeşitli cevaplar için temperature'ı biraz artır
+        if turkish:
+            temperature = min(temperature + 0.2, 1.0)
+
+        client = http_clients.get("ollama")
+        async with llm_scheduler.slot(priority):
+            response = await client.post("/api/chat", json=_chat_payload(messages, temperature, max_tokens, False))
+
+        if response.status_code == 200:
+            data = response.json()
+            eval_usage = prompt_eval_stats.record(data)
+            if usage is not None:
+                usage.update(eval_usage)
+            cleaned_result = clean_response(data.get("message", {}).get("content", ""))
+            return cleaned_result or "Cevap üretilemedi."
 
+        if response.status_code == 404:
+            ollama_readiness.invalidate(f"HTTP 404: {OLLAMA_MODEL}")
+            return f"❌ 404 Hatası: Model '{OLLAMA_MODEL}' bulunamadı!\n\nÇözüm:\n1. 'ollama list' komutunu çalıştır\n2. Model adını kontrol et\n3. llm.py'de OLLAMA_MODEL değişkenini düzelt"
+
+        error_text = response.text
+        print(f"[LLM] ❌ HTTP {response.status_code}: {error_text}")
+        ollama_readiness.invalidate(f"HTTP {response.status_code}")
+        return f"Ollama HTTP {response.status_code}: {error_text}"
+
+    except LLMOverloaded:
+        raise
     except httpx.TimeoutException:
         print(f"[LLM] ⏱️ Timeout hatası")
+        ollama_readiness.invalidate("Timeout")
         return "⏱️ Timeout - Model çok yavaş yanıt veriyor."
     except Exception as e:
         print(f"[LLM] ❌ Beklenmeyen hata: {str(e)}")
-        return f"❌ Hata: {str(e)}"
\ No newline at end of file
+        ollama_readiness.invalidate(str(e))
+        return f"❌ Hata: {str(e)}"
+
+
+async def stream_ollama(
+    mode_prompt: str,
+    history: List[Dict],
+    user_content: str,
+    temperature: float = 0.3,
+    max_tokens: int = 400,
+    priority: int = PRIORITY_INTERACTIVE,
+    usage: Optional[Dict] = None
+) -> AsyncIterator[str]:
+    """
+    Ollama /api/chat'ten token token üretim (stream endpoint'i için)
+    Hata durumunda hazırlık önbelleğini geçersiz kılar ve istisnayı yükseltir
+    Slot tüm stream boyunca tutulur; kuyruk doluysa LLMOverloaded yükseltir
+    """
+    messages, turkish = build_chat_messages(mode_prompt, history, user_content)
+    if turkish:
+        temperature = min(temperature + 0.2, 1.0)
+
+    try:
+        client = http_clients.get("ollama")
+        async with llm_scheduler.slot(priority):
+            async with client.stream(
+                "POST",
+                "/api/chat",
+                json=_chat_payload(messages, temperature, max_tokens, True)
+            ) as response:
+                if response.status_code != 200:
+                    raise RuntimeError(f"Ollama HTTP {response.status_code}")
+
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    try:
+                        data = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+
+                    token = data.get("message", {}).get("content", "")
+                    if token:
+                        yield token
+                    if data.get("done", False):
+                        eval_usage = prompt_eval_stats.record(data)
+                        if usage is not None:
+                            usage.update(eval_usage)
+                        break
+    except LLMOverloaded:
+        raise
+    except Exception as e:
+        ollama_readiness.invalidate(str(e))
+        raise
+
+
+async def complete_ollama(
+    messages: List[Dict],
+    temperature: float = 0.2,
+    max_tokens: int = 200,
+    priority: int = PRIORITY_BACKGROUND
+) -> str:
+    """
+    Yardımcı işler (özetleme vb.) için sade /api/chat çağrısı.
+    Sistem öneki eklenmez; hata metni döndürmek yerine istisna yükseltir.
+    """
+    client = http_clients.get("ollama")
+    async with llm_scheduler.slot(priority):
+        response = await client.post("/api/chat", json=_chat_payload(messages, temperature, max_tokens, False))
+    if response.status_code != 200:
+        raise RuntimeError(f"Ollama HTTP {response.status_code}")
+    data = response.json()
+    prompt_eval_stats.record(data)
+    return clean_response(data.get("message", {}).get("content", ""))
@@ -1,79 +1,295 @@
-from typing import List
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from pydantic import BaseModel
+import time
+import asyncio
 
+SUMMARY_TRIGGER_MESSAGES = 12   # bu sayıyı aşınca eski turlar özete katlanır
+SUMMARY_KEEP_RECENT = 6         # katlamadan sonra ham kalan son mesaj sayısı
+MAX_MESSAGES_HARD_LIMIT = 40    # özetleme başarısız olsa bile üst sınır
+MEMORY_MAX_BYTES = 64 * 1024 * 1024     # tüm oturumların toplam bellek bütçesi
+MEMORY_MAX_SESSIONS = 10000
+MEMORY_SWEEP_INTERVAL = 5 * 60          # saniye - boşta oturum temizleme aralığı
+MESSAGE_OVERHEAD_BYTES = 120            # mesaj nesnesi + liste girdisi (yaklaşık)
+SESSION_OVERHEAD_BYTES = 600            # oturum nesnesi + sözlük girdisi (yaklaşık)
 
-class ChatMessage(BaseModel):
-    role: str        # "user" veya "assistant"
-    content: str
-    timestamp: datetime
-    message_type: str = "text"
+SummarizeFn = Callable[[str, List[Tuple[str, str]]], Awaitable[str]]
+PersistFn = Callable[[str, str, str, str, float], None]
+LoadFn = Callable[[str, str, datetime, int], Awaitable[Tuple[str, List[Tuple[str, str, datetime]]]]]
+SaveSummaryFn = Callable[[str, str, str, datetime], Awaitable[None]]
 
 
-class ChatMemory(BaseModel):
-    user_id: str
-    messages: List[ChatMessage] = []
-    created_at: datetime = datetime.now()
-    last_activity: datetime = datetime.now()
-    context_summary: str = ""
+class ChatMessage:
+    """Hafif mesaj kaydı (Pydantic yerine __slots__)"""
+    __slots__ = ("role", "content", "created")
+
+    message_type = "text"
+
+    def __init__(self, role: str, content: str, timestamp: Optional[datetime] = None):
+        self.role = role            # "user" veya "assistant"
+        self.content = content
+        self.created = (timestamp or datetime.now()).timestamp()
+
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.created)
+
+    def size(self) -> int:
+        return len(self.content.encode("utf-8")) + MESSAGE_OVERHEAD_BYTES
+
+
+class ChatMemory:
+    __slots__ = (
+        "user_id", "messages", "created_at", "last_activity", "context_summary",
+        "size", "hydrated", "_context", "_summarizing"
+    )
+
+    def __init__(self, user_id: str):
+        now = datetime.now()
+        self.user_id = user_id
+        self.messages: List[ChatMessage] = []
+        self.created_at = now
+        self.last_activity = now
+        self.context_summary = ""
+        self.size = SESSION_OVERHEAD_BYTES
+        self.hydrated = False           # kalıcı kayıttan yüklendi mi (veya denendi mi)
+        # Önbelleğe alınmış sohbet metni (mesaj eklendikçe sonuna yazılır)
+        self._context: Optional[str] = None
+        self._summarizing = False
+
+    def recompute_size(self) -> int:
+        self.size = (
+            SESSION_OVERHEAD_BYTES
+            + len(self.context_summary.encode("utf-8"))
+            + sum(msg.size() for msg in self.messages)
+        )
+        return self.size
+
+
+def render_message(msg: ChatMessage) -> str:
+    if msg.role == "user":
+        return f"KULLANICI: {msg.content}"
+    return f"ASİSTANT: {msg.content}"
+
+
+def render_summary(summary: str) -> str:
+    return f"ÖNCEKİ KONUŞMA ÖZETİ: {summary}"
 
 
 class ChatMemoryManager:
     """
     Kullanıcı + session bazlı sohbet hafızası yöneticisi.
-    - Son X mesajı tutar
-    - 2 saatten eski oturumları sıfırlar
+    - Mesaj sayısı eşiği aşınca eski turlar arka planda (düşük öncelikli LLM işi)
+      context_summary'ye katlanır, son turlar ham kalır
+    - Sohbet metni oturum başına önbellekte tutulur, yeni mesajda sonuna eklenir
+    - Oturumlar toplam byte ve sayı bütçesiyle sınırlı LRU'da tutulur
+    - 2 saatten uzun süre boşta kalan oturumlar arka planda silinir
+    - Her yeni mesaj persist_fn ile (write-behind) kalıcı kayda gönderilir;
+      bellekte olmayan oturum ilk erişimde load_fn ile SQLite'tan yüklenir
+    - Katlanan özet save_summary_fn ile saklanır, yüklemede özetle birlikte geri gelir
     """
 
-    def __init__(self):
-        self.memories = {}
-        self.max_messages_per_user = 20
+    def __init__(self, max_bytes: int = MEMORY_MAX_BYTES, max_sessions: int = MEMORY_MAX_SESSIONS):
+        self.memories: "OrderedDict[str, ChatMemory]" = OrderedDict()
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self.bytes_used = 0
+        self.max_messages_per_user = MAX_MESSAGES_HARD_LIMIT
         self.session_timeout = timedelta(hours=2)
+        self._sweeper: Optional[asyncio.Task] = None
+        self.summarize_fn: Optional[SummarizeFn] = None
+        self.persist_fn: Optional[PersistFn] = None
+        self.load_fn: Optional[LoadFn] = None
+        self.save_summary_fn: Optional[SaveSummaryFn] = None
+        self._hydrating: dict = {}
+        self.background_tasks: Set[asyncio.Task] = set()
+        self.metrics = {
+            "context_hits": 0,
+            "context_rebuilds": 0,
+            "summaries": 0,
+            "summary_failures": 0,
+            "folded_messages": 0,
+            "hard_truncations": 0,
+            "summary_time_total": 0.0,
+            "evictions": 0,
+            "swept": 0,
+            "hydrations": 0,
+            "hydrated_messages": 0,
+            "hydration_failures": 0
+        }
 
     def get_memory_key(self, user_id: str, session_id: str) -> str:
         return f"{user_id}_{session_id}"
 
     def get_user_memory(self, user_id: str, session_id: str) -> ChatMemory:
         memory_key = self.get_memory_key(user_id, session_id)
-
-        if memory_key not in self.memories:
-            self.memories[memory_key] = ChatMemory(
-                user_id=user_id,
-                messages=[],
-                created_at=datetime.now(),
-                last_activity=datetime.now()
-            )
-
-        memory = self.memories[memory_key]
+        memory = self.memories.get(memory_key)
 
         # Oturum süresi dolmuşsa sıfırla
-        if datetime.now() - memory.last_activity > self.session_timeout:
-            self.memories[memory_key] = ChatMemory(
-                user_id=user_id,
-                messages=[],
-                created_at=datetime.now(),
-                last_activity=datetime.now()
-            )
-            memory = self.memories[memory_key]
+        if memory is not None and datetime.now() - memory.last_activity > self.session_timeout:
+            self._drop(memory_key)
+            memory = None
+
+        if memory is None:
+            memory = ChatMemory(user_id=user_id)
+            self.memories[memory_key] = memory
+            self.bytes_used += memory.size
+            self._enforce_budget()
+        else:
+            self.memories.move_to_end(memory_key)
 
         return memory
 
+    def _drop(self, memory_key: str):
+        memory = self.memories.pop(memory_key, None)
+        if memory is not None:
+            self.bytes_used -= memory.size
+
+    def _resize(self, memory: ChatMemory):
+        old = memory.size
+        self.bytes_used += memory.recompute_size() - old
+
+    def _enforce_budget(self):
+        # En uzun süredir kullanılmayan oturumlardan başlayarak sil (en yeni oturum kalır)
+        while len(self.memories) > 1 and (
+            self.bytes_used > self.max_bytes or len(self.memories) > self.max_sessions
+        ):
+            memory_key = next(iter(self.memories))
+            self._drop(memory_key)
+            self.metrics["evictions"] += 1
+
     def add_message(self, user_id: str, session_id: str, role: str, content: str):
         memory = self.get_user_memory(user_id, session_id)
 
-        new_message = ChatMessage(
-            role=role,
-            content=content,
-            timestamp=datetime.now(),
-            message_type="text"
-        )
+        new_message = ChatMessage(role, content)
 
         memory.messages.append(new_message)
         memory.last_activity = datetime.now()
+        message_size = new_message.size()
+        memory.size += message_size
+        self.bytes_used += message_size
+
+        if self.persist_fn is not None:
+            self.persist_fn(user_id, session_id, role, content, new_message.created)
+
+        # Önbellekteki sohbet metnine sadece yeni satırı ekle
+        if memory._context is not None:
+            line = render_message(new_message)
+            memory._context = f"{memory._context}\n{line}" if memory._context else line
 
-        # Mesaj çok artarsa eskileri kes
+        # Özetleme yetişemezse eskileri kes
         if len(memory.messages) > self.max_messages_per_user:
             memory.messages = memory.messages[-self.max_messages_per_user:]
+            memory._context = None
+            self._resize(memory)
+            self.metrics["hard_truncations"] += 1
+
+        if len(memory.messages) > SUMMARY_TRIGGER_MESSAGES:
+            self._schedule_fold(user_id, session_id, memory)
+
+        self._enforce_budget()
+
+    async def hydrate(self, user_id: str, session_id: str):
+        """
+        Oturum bellekte yoksa (yeniden başlatma / LRU tahliyesi) son turları SQLite'tan yükle.
+        Oturum başına bir kez I/O yapılır; aynı anda gelen istekler aynı yüklemeyi bekler.
+        """
+        memory = self.get_user_memory(user_id, session_id)
+        if memory.hydrated or self.load_fn is None:
+            return
+
+        memory_key = self.get_memory_key(user_id, session_id)
+        task = self._hydrating.get(memory_key)
+        if task is None:
+            task = asyncio.create_task(self._load(memory_key, memory, user_id, session_id))
+            self._hydrating[memory_key] = task
+            task.add_done_callback(lambda _: self._hydrating.pop(memory_key, None))
+        await asyncio.shield(task)
+
+    async def _load(self, memory_key: str, memory: ChatMemory, user_id: str, session_id: str):
+        since = datetime.now() - self.session_timeout
+        try:
+            summary, rows = await self.load_fn(user_id, session_id, since, SUMMARY_TRIGGER_MESSAGES)
+        except Exception as e:
+            self.metrics["hydration_failures"] += 1
+            print(f"[MEMORY] ⚠️ Oturum yüklenemedi ({memory_key}): {e}")
+            summary, rows = "", []
+        memory.hydrated = True
+
+        if self.memories.get(memory_key) is not memory:
+            return
+
+        # Canlı turlar DB/kuyrukta da olabilir; anahtar mikrosaniyelik datetime
+        # (epoch float → datetime → float dönüşümü aynı float'ı vermez)
+        known = {(m.role, m.content, m.timestamp) for m in memory.messages}
+        loaded = [
+            ChatMessage(role, content, timestamp)
+            for role, content, timestamp in rows
+            if (role, content, timestamp) not in known
+        ]
+        restore_summary = bool(summary) and not memory.context_summary
+        if not loaded and not restore_summary:
+            return
+        if restore_summary:
+            memory.context_summary = summary
+        memory.messages = loaded + memory.messages
+        memory._context = None
+        self._resize(memory)
+        self.metrics["hydrations"] += 1
+        self.metrics["hydrated_messages"] += len(loaded)
+        print(f"[MEMORY] 💾 {len(loaded)} mesaj{' + özet' if restore_summary else ''} SQLite'tan yüklendi ({memory_key})")
+
+    def _schedule_fold(self, user_id: str, session_id: str, memory: ChatMemory):
+        if self.summarize_fn is None or memory._summarizing:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(self._fold(user_id, session_id, memory))
+        except RuntimeError:
+            return
+        memory._summarizing = True
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    async def _fold(self, user_id: str, session_id: str, memory: ChatMemory):
+        """Eski turları özete katla; iş sürerken gelen mesajlara dokunma"""
+        memory_key = self.get_memory_key(user_id, session_id)
+        started = time.perf_counter()
+        folded = memory.messages[:-SUMMARY_KEEP_RECENT]
+        try:
+            summary = await self.summarize_fn(
+                memory.context_summary,
+                [(m.role, m.content) for m in folded]
+            )
+        except Exception as e:
+            self.metrics["summary_failures"] += 1
+            print(f"[MEMORY] ⚠️ Özetleme başarısız: {e}")
+            return
+        finally:
+            memory._summarizing = False
+
+        # Bu sırada oturum silinmiş / sıfırlanmışsa sonucu at
+        if self.memories.get(memory_key) is not memory:
+            return
+
+        # Katlanan mesajlar hâlâ baştaysa çıkar (hard limit kesmiş olabilir)
+        count = 0
+        while count < len(folded) and count < len(memory.messages) and memory.messages[count] is folded[count]:
+            count += 1
+        memory.messages = memory.messages[count:]
+        memory.context_summary = summary
+        memory._context = None
+        self._resize(memory)
+
+        self.metrics["summaries"] += 1
+        self.metrics["folded_messages"] += count
+        self.metrics["summary_time_total"] += time.perf_counter() - started
+        print(f"[MEMORY] 🧾 {count} mesaj özete katlandı ({memory_key})")
+
+        if self.save_summary_fn is not None and count:
+            try:
+                await self.save_summary_fn(user_id, session_id, summary, folded[count - 1].timestamp)
+            except Exception as e:
+                print(f"[MEMORY] ⚠️ Özet kaydedilemedi ({memory_key}): {e}")
 
     def get_conversation_context(
         self,
@@ -83,24 +299,93 @@ class ChatMemoryManager:
     ) -> str:
         memory = self.get_user_memory(user_id, session_id)
 
-        if not memory.messages:
+        if not memory.messages and not memory.context_summary:
             return ""
 
-        recent_messages = memory.messages[-max_messages:]
+        # Özetleme sürerken mesaj sayısı pencereyi aşabilir: önbelleksiz yol
+        if len(memory.messages) > max_messages:
+            self.metrics["context_rebuilds"] += 1
+            return self._render(memory.context_summary, memory.messages[-max_messages:])
 
-        lines = []
-        for msg in recent_messages:
-            if msg.role == "user":
-                lines.append(f"KULLANICI: {msg.content}")
-            else:
-                lines.append(f"ASİSTANT: {msg.content}")
+        if memory._context is None:
+            self.metrics["context_rebuilds"] += 1
+            memory._context = self._render(memory.context_summary, memory.messages)
+        else:
+            self.metrics["context_hits"] += 1
+        return memory._context
 
+    def _render(self, summary: str, messages: List[ChatMessage]) -> str:
+        lines = [render_summary(summary)] if summary else []
+        lines.extend(render_message(msg) for msg in messages)
         return "\n".join(lines)
 
     def clear_memory(self, user_id: str, session_id: str):
-        memory_key = self.get_memory_key(user_id, session_id)
-        if memory_key in self.memories:
-            del self.memories[memory_key]
+        self._drop(self.get_memory_key(user_id, session_id))
+
+    def sweep(self) -> int:
+        """Boşta kalma süresi dolan oturumları sil"""
+        cutoff = datetime.now() - self.session_timeout
+        expired = [key for key, memory in self.memories.items() if memory.last_activity < cutoff]
+        for memory_key in expired:
+            self._drop(memory_key)
+        self.metrics["swept"] += len(expired)
+        return len(expired)
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(MEMORY_SWEEP_INTERVAL)
+            removed = self.sweep()
+            if removed:
+                print(f"[MEMORY] 🧹 {removed} boşta oturum silindi")
+
+    def start(
+        self,
+        summarize_fn: SummarizeFn,
+        persist_fn: Optional[PersistFn] = None,
+        load_fn: Optional[LoadFn] = None,
+        save_summary_fn: Optional[SaveSummaryFn] = None
+    ):
+        self.summarize_fn = summarize_fn
+        self.persist_fn = persist_fn
+        self.load_fn = load_fn
+        self.save_summary_fn = save_summary_fn
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        """Kapanışta temizleyiciyi ve süren özetleme işlerini iptal et"""
+        if self._sweeper:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+        for task in list(self.background_tasks):
+            task.cancel()
+        if self.background_tasks:
+            await asyncio.gather(*self.background_tasks, return_exceptions=True)
+
+    def get_stats(self) -> dict:
+        summaries = self.metrics["summaries"]
+        return {
+            "sessions": len(self.memories),
+            "bytes_used": self.bytes_used,
+            "max_bytes": self.max_bytes,
+            "evictions": self.metrics["evictions"],
+            "swept": self.metrics["swept"],
+            "hydrations": self.metrics["hydrations"],
+            "hydrated_messages": self.metrics["hydrated_messages"],
+            "hydration_failures": self.metrics["hydration_failures"],
+            "summarizing": len(self.background_tasks),
+            "context_hits": self.metrics["context_hits"],
+            "context_rebuilds": self.metrics["context_rebuilds"],
+            "summaries": summaries,
+            "summary_failures": self.metrics["summary_failures"],
+            "folded_messages": self.metrics["folded_messages"],
+            "hard_truncations": self.metrics["hard_truncations"],
+            "avg_summary_ms": round(self.metrics["summary_time_total"] / summaries * 1000, 1) if summaries else 0
+        }
 
 
 # Global sohbet hafızası yöneticisi
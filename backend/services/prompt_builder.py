@@ -0,0 +1,189 @@
+from typing import Dict, List, Sequence
+import re
+import math
+
+from services.llm import OLLAMA_OPTIONS, build_system_prefix, clamp_predict
+
+CHARS_PER_TOKEN = 3.5           # Türkçe metinde llama tokenizer ortalaması (kelime başına)
+MESSAGE_OVERHEAD_TOKENS = 4     # chat şablonunun mesaj başına eklediği rol/ayraç tokenları
+PROMPT_SAFETY_MARGIN = 64       # tahmin hatası için ayrılan pay
+MIN_QUESTION_TOKENS = 64        # bütçe ne kadar dar olursa olsun sorudan kalacak en az kısım
+SNIPPET_MAX_CHARS = 800
+MAX_SNIPPETS = 5
+MIN_PARTIAL_SNIPPET_TOKENS = 40 # bundan az yer kaldıysa kırpılmış kaynak eklenmez
+RECENT_HISTORY_MESSAGES = 4     # son turlar "yakın geçmiş" önceliğinde
+MAX_HISTORY_MESSAGES = 12
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Kelime başına uzunluk / CHARS_PER_TOKEN, noktalama başına 1 token"""
+    tokens = 0
+    for piece in _TOKEN_RE.findall(text):
+        tokens += math.ceil(len(piece) / CHARS_PER_TOKEN) if piece[0].isalnum() or piece[0] == "_" else 1
+    return tokens
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Metni kelime sınırından kırparak token bütçesine sığdır"""
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    limit = int(max_tokens * CHARS_PER_TOKEN)
+    while limit > 0:
+        cut = text.rfind(" ", 0, limit)
+        candidate = text[:cut if cut > 0 else limit].rstrip() + "…"
+        if estimate_tokens(candidate) <= max_tokens:
+            return candidate
+        limit = int(limit * 0.9)
+    return ""
+
+
+class BuiltPrompt:
+    __slots__ = ("history", "user_content", "tokens")
+
+    def __init__(self, history: List[Dict], user_content: str, tokens: Dict[str, int]):
+        self.history = history
+        self.user_content = user_content
+        self.tokens = tokens
+
+
+class PromptBuilder:
+    """
+    num_ctx'e göre token bütçeli prompt hazırlama.
+    Bütçe = num_ctx - cevap (num_predict, clamp_predict ile sınırlı) - sistem öneki - güvenlik payı
+    Doldurma önceliği: soru → en iyi kaynaklar → yakın geçmiş → konuşma özeti → eski geçmiş
+    Her bölümün kullandığı token sayısı raporlanır.
+    """
+
+    def __init__(self, num_ctx: int = OLLAMA_OPTIONS["num_ctx"]):
+        self.num_ctx = num_ctx
+        self.builds = 0
+        self.total_tokens = 0
+        self.dropped_snippets = 0
+        self.dropped_messages = 0
+        self.truncated_questions = 0
+
+    def build(
+        self,
+        mode_prompt: str,
+        question: str,
+        snippets: Sequence,
+        history: Sequence,
+        max_tokens: int,
+        summary: str = ""
+    ) -> BuiltPrompt:
+        max_tokens = clamp_predict(max_tokens)
+        system_tokens = estimate_tokens(build_system_prefix(mode_prompt)) + MESSAGE_OVERHEAD_TOKENS
+        budget = self.num_ctx - max_tokens - system_tokens - PROMPT_SAFETY_MARGIN
+        tokens = {"system": system_tokens, "budget": max(budget, 0)}
+
+        # 1) Soru (her zaman) + şablon metni
+        question_text = f"SORU: {question}"
+        template_tokens = max(
+            estimate_tokens(self._render("", [])), estimate_tokens(self._render("", [""]))
+        ) + MESSAGE_OVERHEAD_TOKENS
+        question_tokens = estimate_tokens(question_text) + template_tokens
+        if question_tokens > budget:
+            # Soru hiçbir zaman boşa kırpılmaz
+            question_text = truncate_to_tokens(question_text, max(budget - template_tokens, MIN_QUESTION_TOKENS))
+            question_tokens = estimate_tokens(question_text) + template_tokens
+            self.truncated_questions += 1
+        remaining = budget - question_tokens
+        tokens["question"] = question_tokens
+
+        # 2) Kaynaklar (güven sırasıyla gelir)
+        context_parts: List[str] = []
+        snippet_tokens = 0
+        candidates = list(snippets)[:MAX_SNIPPETS]
+        for snippet in candidates:
+            part = f"[KAYNAK {len(context_parts) + 1}]: {snippet.content[:SNIPPET_MAX_CHARS]}"
+            cost = estimate_tokens(part) + 2
+            if cost > remaining:
+                if remaining < MIN_PARTIAL_SNIPPET_TOKENS:
+                    break
+                part = truncate_to_tokens(part, remaining - 2)
+                cost = estimate_tokens(part) + 2
+            context_parts.append(part)
+            snippet_tokens += cost
+            remaining -= cost
+        self.dropped_snippets += len(candidates) - len(context_parts)
+        tokens["snippets"] = snippet_tokens
+
+        # 3) Yakın geçmiş (yeniden eskiye)
+        previous = list(history)[-MAX_HISTORY_MESSAGES:]
+        kept: List[Dict] = []
+        used = {"recent_history": 0, "summary": 0, "older_history": 0}
+        recent = previous[-RECENT_HISTORY_MESSAGES:]
+        older = previous[:-RECENT_HISTORY_MESSAGES] if len(previous) > RECENT_HISTORY_MESSAGES else []
+        remaining = self._fill_history(recent, kept, used, "recent_history", remaining)
+
+        # 4) Konuşma özeti (eski turların katlanmış hali)
+        summary_message = None
+        if summary and len(kept) == len(recent):
+            summary_text = f"ÖNCEKİ KONUŞMA ÖZETİ: {summary}"
+            cost = estimate_tokens(summary_text) + MESSAGE_OVERHEAD_TOKENS
+            if cost <= remaining:
+                summary_message = {"role": "system", "content": summary_text}
+                used["summary"] = cost
+                remaining -= cost
+
+        # 5) Eski geçmiş (yakın geçmiş tamamen sığdıysa)
+        if len(kept) == len(recent):
+            remaining = self._fill_history(older, kept, used, "older_history", remaining)
+
+        kept.reverse()
+        if summary_message:
+            kept.insert(0, summary_message)
+        self.dropped_messages += len(previous) - (len(kept) - (1 if summary_message else 0))
+        tokens.update(used)
+
+        tokens["total"] = system_tokens + question_tokens + snippet_tokens + sum(used.values())
+        self.builds += 1
+        self.total_tokens += tokens["total"]
+
+        return BuiltPrompt(kept, self._render(question_text, context_parts), tokens)
+
+    def _fill_history(self, messages: Sequence, kept: List[Dict], used: Dict[str, int], section: str, remaining: int) -> int:
+        """Mesajları yeniden eskiye bütçe bitene kadar ekle; kalan bütçeyi döndür"""
+        for msg in reversed(messages):
+            cost = estimate_tokens(msg.content) + MESSAGE_OVERHEAD_TOKENS
+            if cost > remaining:
+                break
+            used[section] += cost
+            remaining -= cost
+            kept.append({"role": msg.role, "content": msg.content})
+        return remaining
+
+    def _render(self, question_text: str, context_parts: List[str]) -> str:
+        """Turun değişken kısmı: kaynaklar + soru (sistem öneki ve geçmiş sabit kalır)"""
+        if context_parts:
+            context = "\n\n".join(context_parts)
+            # Minimal prompt (daha az kısıtlama)
+            return f"""BİLGİLER:
+{context}
+
+{question_text}
+
+Yukarıdaki bilgileri ve sohbet geçmişini kullanarak soruyu cevapla. Doğal ve samimi konuş."""
+
+        return f"""{question_text}
+
+Bu konuda bilgi bulunamadı. Sohbet geçmişini dikkate alarak bilgine dayanarak cevap ver."""
+
+    def get_stats(self) -> dict:
+        return {
+            "num_ctx": self.num_ctx,
+            "builds": self.builds,
+            "avg_prompt_tokens": round(self.total_tokens / self.builds, 1) if self.builds else 0,
+            "dropped_snippets": self.dropped_snippets,
+            "dropped_messages": self.dropped_messages,
+            "truncated_questions": self.truncated_questions
+        }
+
+
+# Global prompt hazırlayıcı
+prompt_builder = PromptBuilder()
@@ -0,0 +1,244 @@
+from typing import Any, Callable, List, Dict, Optional, Set
+from datetime import datetime
+import time
+import asyncio
+
+from pydantic import BaseModel
+
+from services.knowledge import InformationSnippet, knowledge_system, stats
+from services.web_search import advanced_web_search, scrape_url
+from services.db import search_db, save_to_db
+from services.dedup import content_hash
+
+
+class RetrievalResult(BaseModel):
+    db_snippets: List[InformationSnippet] = []
+    web_snippets: List[InformationSnippet] = []
+    sources: List[Dict] = []
+    used_db: bool = False
+    used_web: bool = False
+    timings: Dict[str, float] = {}
+
+
+ProgressCallback = Callable[[str, Dict[str, Any]], None]
+
+
+class RetrievalOrchestrator:
+    """
+    /api/chat için eşzamanlı bilgi toplama aşaması.
+    - DB ve web dalları paralel çalışır
+    - Scrape edilen sayfalar tamamlandıkça (as-completed) puanlanır ve kabul edilir
+    - DB kaydı arka planda yapılır, cevap yolunu bekletmez
+    - Aşama süreleri (ms) sonuçla birlikte döner ve toplu olarak izlenir
+    - İsteğe bağlı progress callback her aşama bitişinde çağrılır (stream endpoint'i için)
+    """
+
+    def __init__(self):
+        self.stage_metrics: Dict[str, Dict[str, float]] = {}
+        self.background_tasks: Set[asyncio.Task] = set()
+
+    def record(
+        self,
+        timings: Dict[str, float],
+        stage: str,
+        started: float,
+        progress: Optional[ProgressCallback] = None,
+        **info: Any
+    ):
+        """Aşama süresini kaydet; progress verilmişse aşama bitişini bildir"""
+        elapsed = round((time.perf_counter() - started) * 1000, 1)
+        timings[stage] = elapsed
+        m = self.stage_metrics.setdefault(stage, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        m["count"] += 1
+        m["total_ms"] += elapsed
+        m["max_ms"] = max(m["max_ms"], elapsed)
+        if progress:
+            try:
+                progress(stage, {"elapsed_ms": elapsed, **info})
+            except Exception as e:
+                print(f"[RETRIEVAL] ⚠️ Progress callback hatası: {e}")
+
+    async def _db_branch(self, query: str, result: RetrievalResult, progress: Optional[ProgressCallback] = None):
+        started = time.perf_counter()
+        db_results = await search_db(query, n=3, min_relevance=60.0)
+
+        for item in db_results:
+            scraped_at = item["metadata"].get("scraped_at", datetime.now().isoformat())
+            result.db_snippets.append(
+                InformationSnippet(
+                    content=item["content"],
+                    source_type="internal_kb",
+                    source_url=item["metadata"].get("url", ""),
+                    confidence=item["relevance"] / 100,
+                    timestamp=datetime.fromisoformat(scraped_at),
+                    category=item["metadata"].get("category", "general")
+                )
+            )
+        result.used_db = bool(result.db_snippets)
+        self.record(result.timings, "db_search", started, progress, results=len(result.db_snippets))
+
+    def _save_in_background(self, content: str, metadata: Dict, doc_id: str):
+        async def save():
+            if await save_to_db(content, metadata, doc_id):
+                stats["total_scraped"] += 1
+
+        task = asyncio.create_task(save())
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    def _admit_page(self, query: str, search_result: Dict, content: str, result: RetrievalResult) -> Optional[int]:
+        """Kalite kontrolünden geçen sayfayı snippet olarak ekle"""
+        if not isinstance(content, str) or len(content) <= 100:
+            return None
+
+        qa = knowledge_system.assess_content_quality_advanced(
+            content, search_result["title"], search_result["url"]
+        )
+        if qa["quality_score"] < 0.4:
+            stats["quality_rejected"] += 1
+            return None
+
+        domain_trust = qa["domain_trust"]
+        source_type = "general_web"
+        if domain_trust > 0.9:
+            source_type = "official_site"
+        elif domain_trust > 0.8:
+            source_type = "reputable_news"
+
+        self._save_in_background(content, {
+            "source": "web",
+            "url": search_result["url"],
+            "title": search_result["title"],
+            "query": query,
+            "category": "web_scraped",
+            "scraped_at": datetime.now().isoformat(),
+            "quality_score": qa["quality_score"],
+            "domain_trust": domain_trust
+        }, f"web_{content_hash(search_result['url'])}")
+
+        result.web_snippets.append(
+            InformationSnippet(
+                content=f"{search_result['title']}: {content}",
+                source_type=source_type,
+                source_url=search_result["url"],
+                confidence=domain_trust * 0.8,
+                timestamp=datetime.now(),
+                category="web_content",
+                quality_score=qa["quality_score"],
+                domain_trust=domain_trust
+            )
+        )
+        result.sources.append({
+            "title": search_result["title"],
+            "url": search_result["url"],
+            "quality_score": round(qa["quality_score"], 2),
+            "domain_trust": round(domain_trust, 2)
+        })
+        return len(result.sources) - 1
+
+    async def _web_branch(
+        self,
+        query: str,
+        search_query: str,
+        max_sources: int,
+        result: RetrievalResult,
+        progress: Optional[ProgressCallback] = None
+    ):
+        started = time.perf_counter()
+        stats["total_web_searches"] += 1
+
+        search_results = await advanced_web_search(search_query, max_sources)
+        self.record(result.timings, "web_search", started, progress, results=len(search_results))
+        if not search_results:
+            return
+
+        result.used_web = True
+        print(f"[RETRIEVAL] {len(search_results)} URL scraping...")
+
+        async def scrape(rank: int, search_result: Dict):
+            return rank, search_result, await scrape_url(search_result["url"])
+
+        scrape_started = time.perf_counter()
+        admitted_ranks: Dict[int, int] = {}
+        # Görevler bu dalın sahipliğinde: iptal/hata durumunda arkada yetim scrape kalmaz
+        tasks = [asyncio.create_task(scrape(rank, r)) for rank, r in enumerate(search_results)]
+
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    rank, search_result, content = await next_done
+                except Exception as e:
+                    print(f"[RETRIEVAL] ⚠️ Scrape hatası: {e}")
+                    continue
+
+                if "scrape_first" not in result.timings:
+                    self.record(result.timings, "scrape_first", scrape_started, progress)
+
+                position = self._admit_page(query, search_result, content, result)
+                if position is not None:
+                    admitted_ranks[position] = rank
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.record(result.timings, "scrape_all", scrape_started, progress, admitted=len(result.sources))
+
+        # Tamamlanma sırası yerine arama sıralamasını koru
+        order = sorted(range(len(result.sources)), key=lambda i: admitted_ranks[i])
+        result.sources = [result.sources[i] for i in order]
+        result.web_snippets = [result.web_snippets[i] for i in order]
+        print(f"[RETRIEVAL] ✅ {len(result.sources)} kaliteli kaynak")
+
+    async def retrieve(
+        self,
+        query: str,
+        search_query: Optional[str] = None,
+        use_web: bool = True,
+        max_sources: int = 5,
+        progress: Optional[ProgressCallback] = None
+    ) -> RetrievalResult:
+        """DB ve web dallarını paralel çalıştır; toplam süre en yavaş dala eşit olur"""
+        started = time.perf_counter()
+        result = RetrievalResult()
+
+        branches = [asyncio.create_task(self._db_branch(query, result, progress))]
+        if use_web:
+            branches.append(asyncio.create_task(
+                self._web_branch(query, search_query or query, max_sources, result, progress)
+            ))
+
+        try:
+            outcomes = await asyncio.gather(*branches, return_exceptions=True)
+        finally:
+            # İptal/zaman aşımında dallar (ve scrape görevleri) arkada çalışmaya devam etmesin
+            for branch in branches:
+                branch.cancel()
+            await asyncio.gather(*branches, return_exceptions=True)
+
+        for outcome in outcomes:
+            if isinstance(outcome, Exception):
+                print(f"[RETRIEVAL] ❌ Dal hatası: {outcome}")
+
+        self.record(result.timings, "retrieval_total", started, progress)
+        print(f"[RETRIEVAL] ⏱️ {result.timings}")
+        return result
+
+    async def drain(self):
+        """Kapanışta bekleyen arka plan DB kayıtlarını tamamla"""
+        if self.background_tasks:
+            await asyncio.gather(*self.background_tasks, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            stage: {
+                "count": int(m["count"]),
+                "avg_ms": round(m["total_ms"] / m["count"], 1),
+                "max_ms": m["max_ms"]
+            }
+            for stage, m in self.stage_metrics.items()
+        }
+
+
+# Global bilgi toplama orkestratörü
+retrieval_orchestrator = RetrievalOrchestrator()
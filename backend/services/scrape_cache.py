@@ -0,0 +1,151 @@
+from typing import Dict, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+
+SCRAPE_CACHE_PATH = "D:/AI/backend/scrape_cache.db"
+SCRAPE_CACHE_TTL = 30 * 60                      # saniye - bu süre içinde ağa hiç gidilmez
+SCRAPE_CACHE_MAX_BYTES = 200 * 1024 * 1024      # metin toplamı üst sınırı
+
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "yclid", "mc_cid", "mc_eid")
+
+
+def canonical_url(url: str) -> str:
+    """Aynı sayfanın farklı yazımlarını tek anahtara indir"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not (scheme == "http" and parts.port == 80) and not (scheme == "https" and parts.port == 443):
+        host = f"{host}:{parts.port}"
+
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(_TRACKING_PARAMS)
+    ))
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path[:-1]
+
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+class ScrapeCache:
+    """
+    Disk tabanlı (SQLite) scrape önbelleği.
+    - Kanonik URL → çıkarılmış metin + ETag / Last-Modified
+    - TTL içinde doğrudan döner, sonrasında koşullu istekle yeniden doğrulanır
+    - Toplam boyut sınırı aşılınca en uzun süredir kullanılmayanlar silinir
+    """
+
+    def __init__(
+        self,
+        path: str = SCRAPE_CACHE_PATH,
+        ttl: float = SCRAPE_CACHE_TTL,
+        max_bytes: int = SCRAPE_CACHE_MAX_BYTES
+    ):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                validated_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_last_access ON pages(last_access)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    # --- senkron çekirdek (thread içinde çalışır) ---
+
+    def _get(self, url: str) -> Optional[Dict]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT text, etag, last_modified, validated_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE pages SET last_access = ? WHERE url = ?", (time.time(), url))
+            self.conn.commit()
+        return {"text": row[0], "etag": row[1], "last_modified": row[2], "validated_at": row[3]}
+
+    def _put(self, url: str, text: str, etag: Optional[str], last_modified: Optional[str]):
+        size = len(text.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self.conn.execute("SELECT size FROM pages WHERE url = ?", (url,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages (url, text, etag, last_modified, validated_at, last_access, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, text, etag, last_modified, now, now, size)
+            )
+            self.total_bytes += size - (old[0] if old else 0)
+            self._evict()
+            self.conn.commit()
+
+    def _touch(self, url: str):
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "UPDATE pages SET validated_at = ?, last_access = ? WHERE url = ?", (now, now, url)
+            )
+            self.conn.commit()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes:
+            rows = self.conn.execute(
+                "SELECT url, size FROM pages ORDER BY last_access LIMIT 50"
+            ).fetchall()
+            if not rows:
+                self.total_bytes = 0
+                break
+            self.conn.executemany("DELETE FROM pages WHERE url = ?", [(r[0],) for r in rows])
+            self.total_bytes -= sum(r[1] for r in rows)
+            self.stats["evictions"] += len(rows)
+
+    # --- async arayüz ---
+
+    async def get(self, url: str) -> Optional[Dict]:
+        return await asyncio.to_thread(self._get, url)
+
+    async def put(self, url: str, text: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self.stats["stores"] += 1
+        await asyncio.to_thread(self._put, url, text, etag, last_modified)
+
+    async def touch(self, url: str):
+        await asyncio.to_thread(self._touch, url)
+
+    def is_fresh(self, entry: Dict) -> bool:
+        return time.time() - entry["validated_at"] < self.ttl
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def get_stats(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["revalidated"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            "revalidate_rate": round(self.stats["revalidated"] / lookups, 3) if lookups else 0.0,
+            "miss_rate": round(self.stats["misses"] / lookups, 3) if lookups else 0.0,
+            "total_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes
+        }
+
+
+# Global scrape önbelleği
+scrape_cache = ScrapeCache()
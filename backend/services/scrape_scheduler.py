@@ -0,0 +1,135 @@
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+import time
+import asyncio
+
+SCRAPE_MAX_IN_FLIGHT = 16           # tüm domainler için eşzamanlı scrape üst sınırı
+SCRAPE_PER_HOST_CONCURRENCY = 2     # aynı domaine eşzamanlı istek
+SCRAPE_PER_HOST_INTERVAL = 0.5      # aynı domaine iki istek başlangıcı arası (saniye)
+SCRAPE_MAX_TRACKED_HOSTS = 500
+
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class HostState:
+    def __init__(self, concurrency: int):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.next_start = 0.0
+        self.active = 0
+        self.requests = 0
+        self.latency_total = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, elapsed_ms: float):
+        self.requests += 1
+        self.latency_total += elapsed_ms
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.histogram[i] += 1
+                return
+        self.histogram[-1] += 1
+
+
+class ScrapeScheduler:
+    """
+    Scrape istekleri için nezaket zamanlayıcısı.
+    - Global eşzamanlı istek sınırı
+    - Domain başına eşzamanlılık ve istek aralığı sınırı
+    - Bekleyenler FIFO sırayla (asyncio.Semaphore) ilerler
+    - Kuyruk derinliği, bekleme süresi ve domain bazlı gecikme histogramı tutulur
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = SCRAPE_MAX_IN_FLIGHT,
+        per_host_concurrency: int = SCRAPE_PER_HOST_CONCURRENCY,
+        per_host_interval: float = SCRAPE_PER_HOST_INTERVAL
+    ):
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_interval = per_host_interval
+        self.global_slots = asyncio.Semaphore(max_in_flight)
+        self.hosts: "OrderedDict[str, HostState]" = OrderedDict()
+        self.waiting = 0
+        self.in_flight = 0
+        self.max_waiting = 0
+        self.wait_total = 0.0
+        self.granted = 0
+
+    def _host_state(self, host: str) -> HostState:
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = HostState(self.per_host_concurrency)
+            self._prune()
+        self.hosts.move_to_end(host)
+        return state
+
+    def _prune(self):
+        # Boşta olan en eski domain kayıtlarını unut
+        for host in list(self.hosts):
+            if len(self.hosts) <= SCRAPE_MAX_TRACKED_HOSTS:
+                break
+            if self.hosts[host].active == 0 and not self.hosts[host].semaphore.locked():
+                del self.hosts[host]
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """İstek için domain + global slot al; gövde süresi gecikme olarak ölçülür"""
+        host = (urlsplit(url).hostname or "").lower()
+        state = self._host_state(host)
+        loop = asyncio.get_running_loop()
+
+        queued = time.perf_counter()
+        granted = False
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        state.active += 1
+        try:
+            async with state.semaphore:
+                # Domain istek aralığı: sıradaki başlangıç zamanını ayır
+                now = loop.time()
+                start_at = max(now, state.next_start)
+                state.next_start = start_at + self.per_host_interval
+                if start_at > now:
+                    await asyncio.sleep(start_at - now)
+
+                async with self.global_slots:
+                    granted = True
+                    self.waiting -= 1
+                    self.granted += 1
+                    self.wait_total += time.perf_counter() - queued
+                    self.in_flight += 1
+                    started = time.perf_counter()
+                    try:
+                        yield
+                    finally:
+                        self.in_flight -= 1
+                        state.observe((time.perf_counter() - started) * 1000)
+        finally:
+            state.active -= 1
+            if not granted:
+                # Slot alınamadan iptal edildi
+                self.waiting -= 1
+
+    def get_stats(self) -> dict:
+        labels = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "avg_wait_ms": round(self.wait_total / self.granted * 1000, 1) if self.granted else 0,
+            "hosts": {
+                host: {
+                    "requests": state.requests,
+                    "active": state.active,
+                    "avg_latency_ms": round(state.latency_total / state.requests, 1) if state.requests else 0,
+                    "histogram": dict(zip(labels, state.histogram))
+                }
+                for host, state in self.hosts.items()
+                if state.requests
+            }
+        }
+
+
+# Global scrape zamanlayıcısı
+scrape_scheduler = ScrapeScheduler()
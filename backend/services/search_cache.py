@@ -0,0 +1,167 @@
+from typing import Any, Awaitable, Callable, Dict, Set
+from collections import OrderedDict
+import re
+import json
+import time
+import asyncio
+import unicodedata
+
+from services.knowledge import stats
+
+SEARCH_CACHE_TTL = 60 * 60                      # saniye - taze kabul süresi
+SEARCH_CACHE_STALE_TTL = 6 * 60 * 60            # taze süreden sonra bayat ama kullanılabilir
+SEARCH_CACHE_MAX_ENTRIES = 1000
+SEARCH_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCT_RE = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_query(query: str) -> str:
+    """Boşluk / büyük-küçük harf / soru işareti farklarını tek anahtara indir"""
+    query = unicodedata.normalize("NFC", query)
+    # Türkçe büyük harfler: İ → i, I → ı
+    query = query.replace("İ", "i").replace("I", "ı").lower()
+    query = _WHITESPACE_RE.sub(" ", query).strip()
+    return _TRAILING_PUNCT_RE.sub("", query)
+
+
+class CacheEntry:
+    __slots__ = ("value", "created_at", "size")
+
+    def __init__(self, value: Any, size: int):
+        self.value = value
+        self.created_at = time.monotonic()
+        self.size = size
+
+
+class SearchCache:
+    """
+    advanced_web_search için async önbellek.
+    - Aynı anda gelen özdeş sorgular tek SearXNG isteğinde birleşir (single-flight)
+    - Kayıt sayısı ve toplam byte ile sınırlı LRU
+    - Süresi dolan kayıt bayat olarak döner, arka planda yenilenir (stale-while-revalidate)
+    """
+
+    def __init__(
+        self,
+        ttl: float = SEARCH_CACHE_TTL,
+        stale_ttl: float = SEARCH_CACHE_STALE_TTL,
+        max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+        max_bytes: int = SEARCH_CACHE_MAX_BYTES
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.bytes_used = 0
+        self.inflight: Dict[str, asyncio.Task] = {}
+        self.background_tasks: Set[asyncio.Task] = set()
+        self.counters = {
+            "hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0,
+            "refreshes": 0, "evictions": 0, "fetch_errors": 0
+        }
+
+    def make_key(self, query: str, *parts: Any) -> str:
+        return "|".join([normalize_query(query), *(str(p) for p in parts)])
+
+    def _store(self, key: str, value: Any):
+        size = len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        old = self.entries.pop(key, None)
+        if old:
+            self.bytes_used -= old.size
+        self.entries[key] = CacheEntry(value, size)
+        self.bytes_used += size
+
+        while len(self.entries) > self.max_entries or self.bytes_used > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes_used -= evicted.size
+            self.counters["evictions"] += 1
+
+    def _fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Anahtar için tek bir fetch görevi çalıştır (zaten varsa onu döndür)"""
+        task = self.inflight.get(key)
+        if task is not None:
+            self.counters["coalesced"] += 1
+            return task
+
+        async def run():
+            try:
+                value = await fetch()
+            except Exception:
+                self.counters["fetch_errors"] += 1
+                raise
+            finally:
+                self.inflight.pop(key, None)
+            # Boş sonucu saklama
+            if value:
+                self._store(key, value)
+            return value
+
+        task = asyncio.create_task(run())
+        # Tüm bekleyenler iptal edilse bile hata "never retrieved" uyarısı üretmesin
+        task.add_done_callback(self._consume_exception)
+        self.inflight[key] = task
+        return task
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self.entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.created_at
+            if age < self.ttl:
+                self.entries.move_to_end(key)
+                self.counters["hits"] += 1
+                stats["cache_hits"] += 1
+                return entry.value
+
+            if age < self.ttl + self.stale_ttl:
+                # Bayat kaydı hemen döndür, arka planda yenile
+                self.entries.move_to_end(key)
+                self.counters["stale_hits"] += 1
+                stats["cache_hits"] += 1
+                if key not in self.inflight:
+                    self.counters["refreshes"] += 1
+                    refresh = self._fetch(key, fetch)
+                    self.background_tasks.add(refresh)
+                    refresh.add_done_callback(self._forget_background)
+                return entry.value
+
+            self._drop(key)
+
+        self.counters["misses"] += 1
+        stats["cache_misses"] += 1
+        # shield: bir çağıran iptal edilirse ortak fetch diğerleri için sürsün
+        return await asyncio.shield(self._fetch(key, fetch))
+
+    @staticmethod
+    def _consume_exception(task: asyncio.Task):
+        if not task.cancelled():
+            task.exception()
+
+    def _forget_background(self, task: asyncio.Task):
+        self.background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[SEARCH CACHE] ⚠️ Arka plan yenileme hatası: {task.exception()}")
+
+    def _drop(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry:
+            self.bytes_used -= entry.size
+
+    def get_stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["stale_hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round((self.counters["hits"] + self.counters["stale_hits"]) / lookups, 3) if lookups else 0.0,
+            "entries": len(self.entries),
+            "bytes": self.bytes_used,
+            "inflight": len(self.inflight)
+        }
+
+
+# Global arama önbelleği
+search_cache = SearchCache()
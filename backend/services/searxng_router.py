@@ -0,0 +1,227 @@
+from typing import Dict, List, Optional
+from collections import deque
+import time
+import random
+import asyncio
+
+from services.http_clients import http_clients
+
+SEARXNG_URLS = ["http://localhost:8888"]
+SEARXNG_EWMA_ALPHA = 0.3                # yeni gecikme ölçümünün ağırlığı
+SEARXNG_HEDGE_PERCENTILE = 0.9          # bu yüzdelikten uzun süren istek için yedek gönder
+SEARXNG_HEDGE_MIN_DELAY = 0.15          # saniye
+SEARXNG_HEDGE_DEFAULT_DELAY = 1.0       # ölçüm yokken kullanılan bekleme
+SEARXNG_FAILURE_THRESHOLD = 3           # art arda bu kadar hata → rotasyondan çıkar
+SEARXNG_PROBE_INTERVAL = 30             # saniye - düşen instance'ları yoklama aralığı
+SEARXNG_LATENCY_WINDOW = 50
+
+
+class SearxngInstance:
+    def __init__(self, url: str):
+        self.url = url
+        self.healthy = True
+        self.ewma_ms: Optional[float] = None
+        self.latencies: deque = deque(maxlen=SEARXNG_LATENCY_WINDOW)
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.errors = 0
+        self.wins = 0
+        self.down_since: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def observe(self, elapsed_ms: float):
+        self.latencies.append(elapsed_ms)
+        if self.ewma_ms is None:
+            self.ewma_ms = elapsed_ms
+        else:
+            self.ewma_ms += SEARXNG_EWMA_ALPHA * (elapsed_ms - self.ewma_ms)
+
+    def hedge_delay(self) -> float:
+        """Bu instance'ın geçmiş gecikmelerinin yüksek yüzdeliği (saniye)"""
+        if len(self.latencies) < 5:
+            return SEARXNG_HEDGE_DEFAULT_DELAY
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * SEARXNG_HEDGE_PERCENTILE))
+        return max(SEARXNG_HEDGE_MIN_DELAY, ordered[index] / 1000)
+
+    def weight(self) -> float:
+        # Hızlı instance daha sık birincil seçilir
+        return 1.0 / max(self.ewma_ms or 500.0, 1.0)
+
+
+class SearxngRouter:
+    """
+    Birden çok SearXNG instance'ı arasında yönlendirme.
+    - Birincil instance EWMA gecikmesine göre ağırlıklı seçilir
+    - Cevap, birincilin p90 gecikmesinde gelmezse sıradaki instance'a yedek (hedged) istek gider
+    - Hata olursa beklemeden sıradakine geçilir; ilk geçerli cevap kazanır, diğerleri iptal edilir
+    - Art arda hata veren instance rotasyondan çıkar, yoklama başarılı olunca geri döner
+    """
+
+    def __init__(self, urls: List[str] = SEARXNG_URLS, probe_interval: float = SEARXNG_PROBE_INTERVAL):
+        self.instances = [SearxngInstance(url) for url in urls]
+        self.probe_interval = probe_interval
+        self.hedges = 0
+        self.all_failed = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def _route(self) -> List[SearxngInstance]:
+        """Deneme sırası: ağırlıklı seçilen birincil + EWMA'ya göre sıralı yedekler"""
+        candidates = [i for i in self.instances if i.healthy]
+        if not candidates:
+            # Hepsi düşmüşse boş dönmek yerine yine de dene
+            candidates = list(self.instances)
+        if len(candidates) <= 1:
+            return candidates
+
+        primary = random.choices(candidates, weights=[i.weight() for i in candidates])[0]
+        backups = sorted(
+            (i for i in candidates if i is not primary),
+            key=lambda i: i.ewma_ms if i.ewma_ms is not None else float("inf")
+        )
+        return [primary, *backups]
+
+    def _mark_failure(self, instance: SearxngInstance, reason: str):
+        instance.errors += 1
+        instance.consecutive_failures += 1
+        instance.last_error = reason
+        if instance.healthy and instance.consecutive_failures >= SEARXNG_FAILURE_THRESHOLD:
+            instance.healthy = False
+            instance.down_since = time.monotonic()
+            print(f"[SEARXNG] 🔻 {instance.url} rotasyondan çıkarıldı: {reason}")
+
+    def _mark_success(self, instance: SearxngInstance, elapsed_ms: float):
+        instance.observe(elapsed_ms)
+        instance.consecutive_failures = 0
+        if not instance.healthy:
+            instance.healthy = True
+            instance.down_since = None
+            print(f"[SEARXNG] 🔺 {instance.url} rotasyona geri döndü")
+
+    async def _query(self, instance: SearxngInstance, params: Dict) -> Dict:
+        instance.requests += 1
+        started = time.perf_counter()
+        try:
+            client = http_clients.get("searxng")
+            response = await client.get(f"{instance.url}/search", params=params)
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+            data = response.json()
+            if not isinstance(data.get("results"), list):
+                raise RuntimeError("Geçersiz JSON cevabı")
+        except asyncio.CancelledError:
+            # Başka istek kazandı; bu bir hata değil. Geçen süre gerçek gecikmenin
+            # alt sınırı, EWMA'dan büyükse yavaşlığı yansıtması için kaydet
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if instance.ewma_ms is None or elapsed_ms > instance.ewma_ms:
+                instance.observe(elapsed_ms)
+            raise
+        except Exception as e:
+            self._mark_failure(instance, str(e) or type(e).__name__)
+            raise
+        self._mark_success(instance, (time.perf_counter() - started) * 1000)
+        return data
+
+    async def search(self, params: Dict) -> Optional[Dict]:
+        """İlk geçerli SearXNG cevabını döndür; hiçbiri cevap vermezse None"""
+        order = self._route()
+        if not order:
+            return None
+
+        pending: Dict[asyncio.Task, SearxngInstance] = {}
+        next_index = 0
+
+        def launch():
+            nonlocal next_index
+            instance = order[next_index]
+            next_index += 1
+            pending[asyncio.create_task(self._query(instance, params))] = instance
+            return instance
+
+        primary = launch()
+        hedge_delay = primary.hedge_delay()
+        try:
+            while pending:
+                timeout = hedge_delay if next_index < len(order) else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Birincil yavaş: sıradaki instance'a yedek istek
+                    self.hedges += 1
+                    hedge_delay = launch().hedge_delay()
+                    continue
+
+                for task in done:
+                    instance = pending.pop(task)
+                    if task.exception() is None:
+                        instance.wins += 1
+                        return task.result()
+                    print(f"[SEARXNG] ❌ {instance.url} - {task.exception()}")
+
+                # Hata: beklemeden sıradakine geç
+                if next_index < len(order):
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        self.all_failed += 1
+        return None
+
+    async def probe(self, instance: SearxngInstance) -> bool:
+        try:
+            client = http_clients.get("searxng")
+            response = await client.get(f"{instance.url}/healthz", timeout=5.0)
+            ok = response.status_code == 200
+        except Exception as e:
+            instance.last_error = str(e) or type(e).__name__
+            ok = False
+        if ok and not instance.healthy:
+            instance.consecutive_failures = 0
+            instance.healthy = True
+            instance.down_since = None
+            print(f"[SEARXNG] 🔺 {instance.url} yoklama başarılı, rotasyona geri döndü")
+        return ok
+
+    async def _probe_loop(self):
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            down = [i for i in self.instances if not i.healthy]
+            if down:
+                await asyncio.gather(*(self.probe(i) for i in down))
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._probe_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> dict:
+        return {
+            "hedges": self.hedges,
+            "all_failed": self.all_failed,
+            "instances": {
+                i.url: {
+                    "healthy": i.healthy,
+                    "ewma_ms": round(i.ewma_ms, 1) if i.ewma_ms is not None else None,
+                    "hedge_delay_ms": round(i.hedge_delay() * 1000, 1),
+                    "requests": i.requests,
+                    "errors": i.errors,
+                    "wins": i.wins,
+                    "down_seconds": round(time.monotonic() - i.down_since, 1) if i.down_since else None,
+                    "last_error": i.last_error
+                }
+                for i in self.instances
+            }
+        }
+
+
+# Global SearXNG yönlendiricisi
+searxng_router = SearxngRouter()
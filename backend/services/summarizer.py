@@ -0,0 +1,40 @@
+from typing import List, Tuple
+
+from services.llm import complete_ollama, PRIORITY_BACKGROUND
+
+SUMMARY_MAX_TOKENS = 200
+SUMMARY_MAX_CHARS = 1200
+
+SUMMARY_SYSTEM_PROMPT = (
+    "Sen bir sohbet özetleyicisisin. Verilen önceki özeti ve yeni konuşma turlarını "
+    "tek bir kısa Türkçe özette birleştir. Kullanıcının adı, tercihleri, konuşulan konular, "
+    "verilen önemli cevaplar ve açık kalan sorular kalsın. Sadece özeti yaz."
+)
+
+
+async def summarize_turns(previous_summary: str, turns: List[Tuple[str, str]]) -> str:
+    """Önceki özeti + eski turları yeni özete katla (düşük öncelikli LLM işi)"""
+    lines = []
+    for role, content in turns:
+        speaker = "KULLANICI" if role == "user" else "ASİSTANT"
+        lines.append(f"{speaker}: {content[:600]}")
+
+    prompt = f"""ÖNCEKİ ÖZET:
+{previous_summary or "Yok"}
+
+YENİ TURLAR:
+{chr(10).join(lines)}
+
+Güncel özet:"""
+
+    summary = await complete_ollama(
+        [
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=SUMMARY_MAX_TOKENS,
+        priority=PRIORITY_BACKGROUND
+    )
+    if not summary:
+        raise RuntimeError("Boş özet")
+    return summary[:SUMMARY_MAX_CHARS]
@@ -1,111 +1,111 @@
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import hashlib
 from datetime import datetime
 
-import httpx
-from bs4 import BeautifulSoup
-
 from services.knowledge import knowledge_system, stats
-from services.db import save_to_db, manage_cache
+from services.search_cache import search_cache
+from services.http_clients import http_clients, DEFAULT_USER_AGENT
+from services.scrape_cache import scrape_cache, canonical_url
+from services.scrape_scheduler import scrape_scheduler
+from services.extraction_pool import extraction_pool
+from services.searxng_router import searxng_router
 
-SEARXNG_URLS = ["http://localhost:8888"]
 SCRAPE_TIMEOUT = 15
+SCRAPE_MAX_BYTES = 1024 * 1024      # sayfa başına indirilecek en fazla HTML
+SCRAPE_HTML_TYPES = ("text/html", "application/xhtml+xml")
+
+http_clients.register_pool(
+    "searxng",
+    timeout=15.0,
+    max_connections=20,
+    max_keepalive=10,
+    headers={
+        'User-Agent': DEFAULT_USER_AGENT,
+        'Accept': 'application/json',
+    }
+)
+http_clients.register_pool(
+    "scrape",
+    timeout=SCRAPE_TIMEOUT,
+    max_connections=50,
+    max_keepalive=20,
+    http2=True,
+    follow_redirects=True,
+    headers={'User-Agent': DEFAULT_USER_AGENT}
+)
 
 
 async def advanced_web_search(query: str, max_results: int = 5, language: str = "tr") -> List[Dict]:
-    """Gelişmiş web araması (SearXNG + kalite filtresi)"""
-    cache_key = f"search_{query}_{max_results}_{language}"
+    """Gelişmiş web araması (önbellek + tekil uçuş + arka planda yenileme)"""
+    cache_key = search_cache.make_key(query, max_results, language)
+    return await search_cache.get_or_fetch(
+        cache_key,
+        lambda: _search_searxng(query, max_results, language)
+    )
 
-    cached = manage_cache(cache_key)
-    if cached:
-        print(f"[SEARXNG] ✅ Cache HIT")
-        return cached
 
+async def _search_searxng(query: str, max_results: int, language: str) -> List[Dict]:
+    """SearXNG araması (instance'lar arası yedekli) + kalite filtresi"""
     all_results: List[Dict] = []
 
-    for searxng_url in SEARXNG_URLS:
-        try:
-            print(f"[SEARXNG] 🔄 Gelişmiş arama: {searxng_url}")
-
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                'Accept': 'application/json',
-            }
-
-            # Sadece ana sorguyu kullan (çok fazla varyasyon yavaşlatıyor)
-            search_variations = [query]
-
-            for search_query in search_variations:
-                async with httpx.AsyncClient(timeout=15.0, headers=headers) as client:
-                    response = await client.get(
-                        f"{searxng_url}/search",
-                        params={
-                            "q": search_query,
-                            "format": "json",
-                            "language": language,
-                            "safesearch": "0"
-                        }
-                    )
-
-                    if response.status_code == 200:
-                        data = response.json()
-                        results_found = len(data.get("results", []))
-                        print(f"[SEARXNG] 📊 SearXNG'den {results_found} sonuç geldi")
-
-                        for item in data.get("results", []):
-                            url = item.get("url", "")
-
-                            # Spam domainleri atla
-                            skip_domains = [
-                                'facebook.com', 'twitter.com', 'instagram.com',
-                                'youtube.com', 'tiktok.com', 'pinterest.com'
-                            ]
-                            if any(d in url for d in skip_domains):
-                                continue
-
-                            content = item.get("content", "") or ""
-                            title = item.get("title", "") or ""
-
-                            # ⚠️ KALİTE FİLTRESİNİ YUMUŞATTIM
-                            quality_check = knowledge_system.assess_content_quality_advanced(
-                                content, title, url
-                            )
-                            
-                            # 0.3 → 0.15 (çok daha az reddedecek)
-                            if quality_check["quality_score"] < 0.15:
-                                stats["quality_rejected"] += 1
-                                print(f"[SEARXNG] ⚠️  Kalite düşük ({quality_check['quality_score']:.2f}): {url[:50]}")
-                                continue
-
-                            result = {
-                                "title": title[:150],
-                                "url": url,
-                                "content": content[:400],
-                                "quality_score": quality_check["quality_score"],
-                                "domain_trust": quality_check["domain_trust"]
-                            }
-
-                            # Güvenilir domainleri öne al
-                            if quality_check["domain_trust"] > 0.8:
-                                all_results.insert(0, result)
-                            else:
-                                all_results.append(result)
-
-                            print(f"[SEARXNG] ✅ Eklendi ({quality_check['quality_score']:.2f}): {title[:50]}")
-
-                            if len(all_results) >= max_results * 2:
-                                break
-
-                    else:
-                        print(f"[SEARXNG] ❌ HTTP {response.status_code}")
-
-                if len(all_results) >= max_results * 2:
-                    break
-
-        except Exception as e:
-            print(f"[SEARXNG] ❌ {searxng_url} - {e}")
+    print(f"[SEARXNG] 🔄 Gelişmiş arama: {query[:50]}")
+    data = await searxng_router.search({
+        "q": query,
+        "format": "json",
+        "language": language,
+        "safesearch": "0"
+    })
+    if data is None:
+        print("[SEARXNG] ❌ Hiçbir SearXNG instance'ı cevap vermedi")
+        return []
+
+    results_found = len(data.get("results", []))
+    print(f"[SEARXNG] 📊 SearXNG'den {results_found} sonuç geldi")
+
+    for item in data.get("results", []):
+        url = item.get("url", "")
+
+        # Spam domainleri atla
+        skip_domains = [
+            'facebook.com', 'twitter.com', 'instagram.com',
+            'youtube.com', 'tiktok.com', 'pinterest.com'
+        ]
+        if any(d in url for d in skip_domains):
             continue
 
+        content = item.get("content", "") or ""
+        title = item.get("title", "") or ""
+
+        # ⚠️ KALİTE FİLTRESİNİ YUMUŞATTIM
+        quality_check = knowledge_system.assess_content_quality_advanced(
+            content, title, url
+        )
+
+        # 0.3 → 0.15 (çok daha az reddedecek)
+        if quality_check["quality_score"] < 0.15:
+            stats["quality_rejected"] += 1
+            print(f"[SEARXNG] ⚠️  Kalite düşük ({quality_check['quality_score']:.2f}): {url[:50]}")
+            continue
+
+        result = {
+            "title": title[:150],
+            "url": url,
+            "content": content[:400],
+            "quality_score": quality_check["quality_score"],
+            "domain_trust": quality_check["domain_trust"]
+        }
+
+        # Güvenilir domainleri öne al
+        if quality_check["domain_trust"] > 0.8:
+            all_results.insert(0, result)
+        else:
+            all_results.append(result)
+
+        print(f"[SEARXNG] ✅ Eklendi ({quality_check['quality_score']:.2f}): {title[:50]}")
+
+        if len(all_results) >= max_results * 2:
+            break
+
     # Sonuçları sırala
     all_results.sort(
         key=lambda x: x.get("quality_score", 0) * x.get("domain_trust", 0.5),
@@ -118,56 +118,87 @@ async def advanced_web_search(query: str, max_results: int = 5, language: str =
     for i, result in enumerate(final_results):
         print(f"  [{i+1}] {result['title'][:50]} (Q:{result['quality_score']:.2f})")
 
-    # Cache'e kaydet
-    if final_results:
-        manage_cache(cache_key, final_results)
-    
     return final_results
 
 
+async def _download_html(client, url: str, headers: Dict) -> Tuple[int, Optional[bytes], Optional[str], Dict]:
+    """
+    Gövdeyi akış halinde, bayt bütçesine kadar indir.
+    HTML olmayan içerik gövde okunmadan reddedilir.
+    """
+    async with client.stream("GET", url, headers=headers) as response:
+        if response.status_code != 200:
+            return response.status_code, None, None, dict(response.headers)
+
+        content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type and content_type not in SCRAPE_HTML_TYPES:
+            print(f"[SCRAPE] ⏭️ HTML değil ({content_type}): {url[:50]}")
+            return response.status_code, None, None, dict(response.headers)
+
+        chunks = []
+        received = 0
+        async for chunk in response.aiter_bytes():
+            chunks.append(chunk)
+            received += len(chunk)
+            if received >= SCRAPE_MAX_BYTES:
+                print(f"[SCRAPE] ✂️ {SCRAPE_MAX_BYTES // 1024} KB sınırında kesildi: {url[:50]}")
+                break
+
+        return response.status_code, b''.join(chunks)[:SCRAPE_MAX_BYTES], response.charset_encoding, dict(response.headers)
+
+
 async def scrape_url(url: str) -> str:
-    """URL'den metin çekme (scraping)"""
+    """URL'den metin çekme (scraping) - önbellek + koşullu yeniden doğrulama"""
     try:
-        async with httpx.AsyncClient(
-            timeout=SCRAPE_TIMEOUT,
-            follow_redirects=True,
-        ) as client:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            response = await client.get(url, headers=headers)
-
-            if response.status_code != 200:
-                print(f"[SCRAPE] ❌ HTTP {response.status_code}: {url[:50]}")
-                return ""
-
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Gereksiz elementleri temizle
-            for tag in soup(['script', 'style', 'nav', 'footer', 'header', 'aside', 'iframe', 'noscript']):
-                tag.decompose()
-
-            # Ana içeriği bul
-            main = (
-                soup.find('main') or
-                soup.find('article') or
-                soup.find('div', class_='content') or
-                soup.find('body')
+        cache_key = canonical_url(url)
+        cached = await scrape_cache.get(cache_key)
+
+        if cached and scrape_cache.is_fresh(cached):
+            scrape_cache.stats["hits"] += 1
+            print(f"[SCRAPE] ✅ Cache HIT: {url[:50]}")
+            return cached["text"]
+
+        headers = {}
+        if cached:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        client = http_clients.get("scrape")
+        # Global + domain bazlı sınırlar içinde indir
+        async with scrape_scheduler.slot(url):
+            status_code, raw, encoding, response_headers = await _download_html(client, url, headers)
+
+        if status_code == 304 and cached:
+            scrape_cache.stats["revalidated"] += 1
+            await scrape_cache.touch(cache_key)
+            print(f"[SCRAPE] ♻️ 304 Not Modified: {url[:50]}")
+            return cached["text"]
+
+        scrape_cache.stats["misses"] += 1
+
+        if status_code != 200:
+            print(f"[SCRAPE] ❌ HTTP {status_code}: {url[:50]}")
+            return ""
+
+        if not raw:
+            return ""
+
+        # CPU yoğun parse işlemi process pool'da
+        text = await extraction_pool.extract(raw, encoding)
+
+        if text:
+            await scrape_cache.put(
+                cache_key,
+                text,
+                etag=response_headers.get("etag"),
+                last_modified=response_headers.get("last-modified")
             )
 
-            if main:
-                text = main.get_text(separator=' ', strip=True)
-            else:
-                text = soup.get_text(separator=' ', strip=True)
-
-            # Temizle
-            lines = [l.strip() for l in text.split('\n') if l.strip() and len(l.strip()) > 20]
-            text = ' '.join(lines)
-
-            print(f"[SCRAPE] ✅ {len(text)} karakter çekildi: {url[:50]}")
-            return text[:8000]
+        print(f"[SCRAPE] ✅ {len(text)} karakter çekildi: {url[:50]}")
+        return text
 
     except Exception as e:
         print(f"[SCRAPE] ❌ {url[:30]}: {str(e)[:50]}")
-        return ""
\ No newline at end of file
+        return ""
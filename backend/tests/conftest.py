@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Testler backend kökünden "services.*" olarak içe aktarır
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Servisler göreli "D:/AI/backend" yollarına yazar; çalışma ağacını kirletmesin
+os.chdir(tempfile.mkdtemp(prefix="backend-tests-"))
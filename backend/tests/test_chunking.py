@@ -0,0 +1,12 @@
+from services.chunking import chunk_text
+
+
+def test_chunks_never_exceed_max_chars_with_long_sentences():
+    short = "Maç saat sekizde başlıyor."
+    long_sentence = " ".join(["Takım son haftalarda çok iyi bir form yakaladı"] * 9) + "."
+    text = " ".join([short, long_sentence, short, long_sentence, short, short, long_sentence])
+
+    for max_chars in (500, 200):
+        chunks = chunk_text(text, max_chars=max_chars, overlap_chars=120)
+        assert len(chunks) > 1
+        assert all(len(c) <= max_chars for c in chunks)
@@ -0,0 +1,39 @@
+import asyncio
+import json
+
+import httpx
+
+from services import llm
+from services.http_clients import http_clients
+
+
+def test_system_prefix_is_stable_across_turns():
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": llm.OLLAMA_MODEL}]})
+        sent.append(json.loads(request.content))
+        return httpx.Response(200, json={"message": {"role": "assistant", "content": "Tamam"}, "done": True})
+
+    async def run():
+        http_clients.clients["ollama"] = httpx.AsyncClient(
+            base_url="http://ollama", transport=httpx.MockTransport(handler)
+        )
+        llm.ollama_readiness.invalidate()
+        try:
+            # Türkçe karaktersiz tur vs. Türkçe karakterli tur
+            await llm.chat_ollama_messages("MOD", [], "[KAYNAK 1]: The match starts at 8pm\n\nSORU: nasilsin")
+            await llm.chat_ollama_messages(
+                "MOD",
+                [{"role": "user", "content": "tamam"}, {"role": "assistant", "content": "Tamam"}],
+                "SORU: Bugün maç var mı, saat kaçta başlıyor?"
+            )
+        finally:
+            await http_clients.clients.pop("ollama").aclose()
+
+    asyncio.run(run())
+
+    assert len(sent) == 2
+    assert sent[0]["messages"][0] == sent[1]["messages"][0]
+    assert llm.TURKISH_SYSTEM_PROMPT in sent[0]["messages"][0]["content"]
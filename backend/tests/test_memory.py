@@ -0,0 +1,49 @@
+import asyncio
+from datetime import datetime
+
+from services.chat_db import ChatDatabase
+from services.memory import ChatMemoryManager
+
+
+def test_hydrate_does_not_duplicate_live_turns():
+    manager = ChatMemoryManager()
+    for i in range(4):
+        manager.add_message("u", "s", "user" if i % 2 == 0 else "assistant", f"mesaj {i}")
+    live = manager.get_user_memory("u", "s").messages
+    for i, message in enumerate(live):
+        message.created = 1_790_000_000.1234567 + i * 0.3333333   # mikrosaniye altı kesirli epoch
+
+    async def load(user_id, session_id, since, limit):
+        # write-behind kuyruğu ve DB satırları datetime taşır
+        older = [("user", "eski soru", datetime(2020, 1, 1, 12, 0, 0, 1))]
+        return "", older + [(m.role, m.content, datetime.fromtimestamp(m.created)) for m in live]
+
+    manager.load_fn = load
+    asyncio.run(manager.hydrate("u", "s"))
+
+    contents = [m.content for m in manager.get_user_memory("u", "s").messages]
+    assert contents == ["eski soru", "mesaj 0", "mesaj 1", "mesaj 2", "mesaj 3"]
+
+
+def test_folded_summary_survives_restart(tmp_path):
+    async def run():
+        db = ChatDatabase(str(tmp_path / "chat.db"))
+        try:
+            covered = datetime(2030, 1, 1, 10, 0, 0, 123456)
+            await db.save_messages([
+                {"user_id": "u", "session_id": "s", "role": "user", "content": "katlandı",
+                 "timestamp": covered, "extra_data": "{}"},
+                {"user_id": "u", "session_id": "s", "role": "user", "content": "yeni",
+                 "timestamp": datetime(2030, 1, 1, 10, 5), "extra_data": "{}"}
+            ])
+            await db.save_summary("u", "s", "kullanıcı maçları sordu", covered)
+
+            stored = await db.get_summary("u", "s", datetime(2000, 1, 1))
+            assert stored == ("kullanıcı maçları sordu", covered)
+
+            await db.clear_session("u", "s")
+            assert await db.get_summary("u", "s", datetime(2000, 1, 1)) is None
+        finally:
+            await db.stop()
+
+    asyncio.run(run())
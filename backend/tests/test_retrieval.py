@@ -0,0 +1,89 @@
+import asyncio
+
+from services import retrieval
+from services.retrieval import RetrievalOrchestrator
+
+
+def test_cancelled_retrieve_cancels_scrapes(monkeypatch):
+    started = []
+    cancelled = []
+
+    async def fake_search(query, max_results=5):
+        return [{"url": f"https://ornek.com/{i}", "title": f"Sayfa {i}"} for i in range(3)]
+
+    async def fake_scrape(url):
+        started.append(url)
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+
+    async def fake_search_db(query, **kwargs):
+        return []
+
+    monkeypatch.setattr(retrieval, "advanced_web_search", fake_search)
+    monkeypatch.setattr(retrieval, "scrape_url", fake_scrape)
+    monkeypatch.setattr(retrieval, "search_db", fake_search_db)
+
+    async def run():
+        task = asyncio.create_task(RetrievalOrchestrator().retrieve("maç saat kaçta"))
+        while len(started) < 3:
+            await asyncio.sleep(0)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        # Yetim scrape görevi kalmamalı
+        assert sorted(cancelled) == sorted(started)
+        assert [t for t in asyncio.all_tasks() if t is not asyncio.current_task()] == []
+
+    asyncio.run(run())
+
+
+def test_failing_or_timed_out_retrieve_leaves_no_tasks(monkeypatch):
+    cancelled = []
+
+    async def fake_search(query, max_results=5):
+        return [{"url": f"https://ornek.com/{i}", "title": f"Sayfa {i}"} for i in range(3)]
+
+    async def fake_scrape(url):
+        if url.endswith("/0"):
+            return "ilk sayfa"
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+
+    async def fake_search_db(query, **kwargs):
+        return []
+
+    def failing_admit(*args):
+        raise RuntimeError("puanlama hatası")
+
+    monkeypatch.setattr(retrieval, "advanced_web_search", fake_search)
+    monkeypatch.setattr(retrieval, "scrape_url", fake_scrape)
+    monkeypatch.setattr(retrieval, "search_db", fake_search_db)
+
+    async def run():
+        orchestrator = RetrievalOrchestrator()
+
+        # Zaman aşımı: bekleyen scrape'ler iptal edilir
+        try:
+            await asyncio.wait_for(orchestrator.retrieve("maç"), 0.05)
+        except asyncio.TimeoutError:
+            pass
+        assert len(cancelled) == 2
+
+        # Dal hatası: sonuç döner, kalan scrape'ler iptal edilir
+        cancelled.clear()
+        monkeypatch.setattr(orchestrator, "_admit_page", failing_admit)
+        result = await orchestrator.retrieve("maç")
+        assert result.sources == []
+        assert len(cancelled) == 2
+        await orchestrator.drain()
+        assert [t for t in asyncio.all_tasks() if t is not asyncio.current_task()] == []
+
+    asyncio.run(run())
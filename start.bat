@@ -58,7 +58,7 @@ echo.
 
 echo [5/7] Backend baslatiliyor...
 cd /d "D:\AI\backend"
-start "" /B python main.py
+start "" /B python -m uvicorn main:app --host 0.0.0.0 --port 8000
 timeout /t 8 /nobreak >nul
 echo ✅ Backend baslatildi (Port 8000)
 echo.